@@ -1,74 +1,47 @@
 import streamlit as st
-import pytesseract
-import cv2
-import numpy as np
-import tempfile
-import os
-import re
+import json
+from concurrent.futures import CancelledError
+import hajj_form
+import job_queue
+from image_core import decode_gray
+from result_cache import content_key
 
 
 # =========================
-# TESSERACT PATH
+# TEMPLATE REGISTER
 # =========================
-if os.name == "nt":
-    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+FULL_PAGE = "Full page OCR (no template)"
 
+FIELDS_EXAMPLE = """[
+  {"name": "SURNAME", "box": [420, 310, 600, 40], "chars": "alpha"},
+  {"name": "PASSPORT NO", "box": [420, 370, 300, 40], "chars": "alnum"},
+  {"name": "CNIC", "box": [420, 430, 360, 40], "chars": "cnic"}
+]"""
 
-# =========================
-# IMAGE PREPROCESS
-# =========================
-def preprocess(img):
-
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-    # sharpen
-    kernel = np.array([[0,-1,0],[-1,5,-1],[0,-1,0]])
-    gray = cv2.filter2D(gray, -1, kernel)
+def register_ui():
 
-    gray = cv2.resize(gray, None, fx=1.5, fy=1.5)
-    gray = cv2.GaussianBlur(gray,(3,3),0)
+    with st.expander("Register form template"):
 
-    return gray
+        st.caption(
+            "Khaali form ki saaf scan aur field boxes (reference image ke pixels mein) do. "
+            "chars: " + ", ".join(hajj_form.WHITELISTS)
+        )
 
+        ref = st.file_uploader("Reference form", type=["jpg","jpeg","png"], key="hajj_template_ref")
+        name = st.text_input("Template name", value="hajj_booking", key="hajj_template_name")
+        fields = st.text_area("Fields (JSON)", value=FIELDS_EXAMPLE, height=160, key="hajj_template_fields")
 
-# =========================
-# CLEAN TEXT
-# =========================
-def clean_line(line):
-
-    line = line.replace("|", "")
-    line = re.sub(r"\s+", " ", line)
-    return line.strip()
-
-
-# =========================
-# FULL TEXT PARSER
-# =========================
-def extract_all_fields(text):
-
-    data = {}
-
-    lines = [clean_line(l) for l in text.split("\n") if l.strip()]
-
-    last_label = ""
-
-    for line in lines:
-
-        # detect label style line
-        if ":" in line:
-            parts = line.split(":",1)
-            label = parts[0].strip()
-            value = parts[1].strip()
-
-            data[label] = value
-            last_label = label
-
-        else:
-            # sometimes value comes next line
-            if last_label and last_label in data and data[last_label] == "":
-                data[last_label] = line
-
-    return data, lines
+        if st.button("Save template", key="hajj_template_save"):
+            if not ref or not name.strip():
+                st.error("Reference form aur name dono chahiye")
+                return
+            try:
+                image = decode_gray(ref)
+                hajj_form.save_template(name.strip(), image, json.loads(fields))
+                st.success(f"Template '{name.strip()}' saved")
+            except Exception as e:
+                st.error(f"Template save nahi hua: {e}")
 
 
 # =========================
@@ -78,30 +51,75 @@ def run():
 
     st.title("🕋 Hajj Form Full Extractor")
 
-    file = st.file_uploader(
-        "Upload Hajj Booking Form",
-        type=["jpg","jpeg","png"]
+    register_ui()
+
+    choice = st.selectbox(
+        "Form template",
+        hajj_form.template_names() + [FULL_PAGE]
     )
 
-    if not file:
+    files = st.file_uploader(
+        "Upload Hajj Booking Forms (images ya multi-page PDF)",
+        type=["jpg","jpeg","png","pdf"],
+        accept_multiple_files=True
+    )
+
+    if not files:
         return
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-        tmp.write(file.getbuffer())
-        path = tmp.name
+    template_name = choice if choice != FULL_PAGE else None
+
+    # OCR job queue ke workers par: har image ek job, PDF ke har
+    # PAGES_PER_JOB pages ek job. Yeh script sirf poll karta hai.
+    spooled = []
+
+    def make_jobs():
+        jobs = {}
+        for i, f in enumerate(files):
+            args, paths = hajj_form.form_jobs(f.name, f.getvalue(), template_name)
+            spooled.extend(paths)
+            for j, a in enumerate(args):
+                jobs[(i, j)] = a
+        return jobs
+
+    signature = (template_name, tuple(content_key(f.getvalue()) for f in files))
+    futures = job_queue.session_jobs(
+        "hajj_form_jobs", signature, hajj_form.extract_pages, make_jobs,
+        cleanup=lambda: hajj_form.remove_files(spooled)
+    )
+    if futures is None:
+        return
 
-    img = cv2.imread(path)
-    processed = preprocess(img)
+    def job_results():
+        for (i, _), future in futures.items():
+            try:
+                yield future.result()
+            except (Exception, CancelledError) as e:
+                yield [{"file": files[i].name, "page": 0, "fields": None, "lines": [],
+                        "method": "", "seconds": 0.0, "error": str(e) or type(e).__name__}]
 
-    # FULL OCR
-    text = pytesseract.image_to_string(
-        processed,
-        config="--psm 6"
-    )
+    # Ek PDF ya kai files: page by page batch table, har job ke aate hi
+    if len(files) > 1 or hajj_form.is_pdf(files[0].getvalue()):
+        def render(done, finished):
+            run_form_batch([r for pages in done for r in pages], template_name, finished)
+
+        job_queue.live_results("hajj_form_jobs", list(futures.values()), job_results, render, "Reading forms")
+        return
+
+    done = []
+    if not job_queue.live_results("hajj_form_jobs", list(futures.values()), job_results,
+                                  lambda jobs, finished: done.extend(jobs), "Reading form"):
+        return
 
-    text = text.upper()
+    results = done[0]
+    r = results[0]
+    if r["error"]:
+        st.error(r["error"])
+        return
 
-    data, lines = extract_all_fields(text)
+    data, lines, method = r["fields"], r["lines"], r["method"]
+    if template_name is not None and method != "template":
+        st.warning("Scan template se align nahi hui, full page OCR chal raha hai")
 
     # =========================
     # OUTPUT 1 : STRUCTURED TABLE
@@ -117,8 +135,46 @@ def run():
     # =========================
     # OUTPUT 2 : FULL TEXT (NO LOSS)
     # =========================
-    st.subheader("Full Extracted Text (Nothing Missing)")
+    if lines:
+        st.subheader("Full Extracted Text (Nothing Missing)")
+
+        st.code("\n".join(lines))
+
 
-    st.code("\n".join(lines))
+# =========================
+# BATCH (PDF / MANY FILES)
+# =========================
+def run_form_batch(results, template_name, finished=True):
+
+    log = st.container()
+
+    for r in results:
+        where = f"{r['file']} page {r['page']}" if r["page"] else r["file"]
+        if r["error"]:
+            log.error(f"{where}: {r['error']}")
+        elif template_name is not None and r["method"] != "template":
+            log.warning(f"{where}: template se align nahi hua, full page OCR")
+
+    rows = hajj_form.form_rows(results)
+    st.dataframe(rows)
+    if not finished:
+        return
 
-    os.remove(path)
+    ok = sum(1 for r in results if not r["error"])
+    st.success(f"{ok} / {len(results)} pages extracted")
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.download_button(
+            "⬇ Download CSV",
+            data=hajj_form.rows_to_csv(rows),
+            file_name="hajj_forms.csv",
+            mime="text/csv"
+        )
+    with c2:
+        st.download_button(
+            "⬇ Download JSON",
+            data=hajj_form.rows_to_json(rows),
+            file_name="hajj_forms.json",
+            mime="application/json"
+        )
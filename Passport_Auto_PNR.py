@@ -1,131 +1,51 @@
 import streamlit as st
-from passporteye import read_mrz
-import datetime
-import pytesseract
-import os
-import cv2
-import uuid
-import re
-
-# ================= TESSERACT =================
-if os.name == "nt":
-    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-else:
-    pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"
+import job_queue
+from passport_pnr import iter_batch, build_pnr_lines, pending_work, timed_passport, cache_on_done, job_failed
+from result_cache import content_key
+
+def show_results(files, events):
+    # Ab tak ke events (upload order) se log, cards aur NM1 / SRDOCS
+    passengers, seen = [], set()
+
+    log = st.container()
+
+    st.subheader("Extracted Passport Details")
+    cards = st.container()
+
+    for ev in events:
+        f, p = files[ev["index"]], ev["record"]
+        took = "cached" if ev["cached"] else f"{ev['seconds']:.1f}s"
+
+        if ev["error"]:
+            log.error(f"{f.name}: {ev['error']}")
+            continue
+
+        if not p:
+            log.warning(f"MRZ not detected! Please upload a clear image for {f.name}.")
+            continue
+
+        passport = p["passport"]
+
+        if passport in seen:
+            log.warning(f"Duplicate skipped: {passport}")
+            continue
+
+        seen.add(passport)
+        passengers.append(p)
+
+        cards.markdown(f"**Passenger {len(passengers)}**\n\nSurname: {p['surname']}  \nGiven Name: {p['names']}  \nPassport: {p['passport']}  \nDOB: {p['dob']}  \nExpiry: {p['exp']}  \nGender: {p['gender']}  \nFather/Husband: {p['father']}  \nCNIC: {p['cnic']}  \n_{f.name} · {took}_")
+
+    nm1_lines, docs_lines = build_pnr_lines(passengers)
+    st.subheader("NM1 Entries")
+    st.code("\n".join(nm1_lines))
+    st.subheader("SRDOCS Entries")
+    st.code("\n".join(docs_lines))
+
+    return passengers
 
 def run():
     st.header("✈️ Passport Auto PNR Builder")
 
-    # ---------- DATE FIX ----------
-    def mrz_date_fix(d):
-        try:
-            if not d or len(str(d)) < 6: return None
-            d = str(d)
-            y = int(d[:2])
-            m = int(d[2:4])
-            da = int(d[4:6])
-            if y > datetime.datetime.now().year % 100: y += 1900
-            else: y += 2000
-            return datetime.datetime(y, m, da)
-        except: return None
-
-    def safe_date(d):
-        dt = mrz_date_fix(d)
-        return "" if dt is None else dt.strftime("%d%b%y").upper()
-
-    def calculate_age(d):
-        birth = mrz_date_fix(d)
-        if birth is None: return 30, ""
-        today = datetime.datetime.today()
-        age = today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
-        return age, birth.strftime("%d%b%y").upper()
-
-    # ---------- TITLE ----------
-    def passenger_title(age, gender):
-        if age >= 12: return "MR" if gender == "M" else "MRS"
-        elif age >= 2: return "CHD"
-        else: return "INF"
-
-    # ---------- NAME CLEANER ----------
-    def clean_word(w):
-        if len(w) <= 1: return False
-        if len(set(w)) == 1: return False
-        if w.count("K") > len(w) * 0.6: return False
-        return True
-
-    def split_joined_name(name):
-        patterns = ["ABDUR", "ABDUL", "REHMAN", "RAHMAN", "SYED", "AHMED", "MUHAMMAD", "MOHAMMAD", "ALI", "HUSSAIN", "HASSAN", "KHAN"]
-        for p in patterns:
-            name = name.replace(p, " " + p)
-        return " ".join(name.split())
-
-    def parse_mrz_names(surname, names):
-        surname = surname.replace("<", "").strip().upper()
-        names = names.replace("<", " ")
-        names = " ".join(names.split()).upper()
-        words = []
-        for w in names.split():
-            if clean_word(w):
-                words.append(split_joined_name(w))
-        return surname, " ".join(words)
-
-    # ---------- OCR EXTRA ----------
-    def extract_extra_fields(path):
-        img = cv2.imread(path)
-        if img is None: return "", ""
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        text = pytesseract.image_to_string(gray).upper()
-        father, cnic = "", ""
-        lines = text.split("\n")
-        for i, line in enumerate(lines):
-            if "FATHER" in line or "HUSBAND" in line:
-                if i + 1 < len(lines):
-                    father = lines[i+1].strip()
-            m = re.search(r"\d{5}-\d{7}-\d", line)
-            if m: cnic = m.group()
-        return father, cnic
-
-    # ---------- NEW SMART MRZ READER ----------
-    def read_mrz_smart(path):
-        img = cv2.imread(path)
-        if img is None: return None
-        
-        # 1. Bina ghumaaye check karo
-        try:
-            mrz = read_mrz(path)
-            if mrz and mrz.to_dict(): return mrz
-        except: pass
-
-        test_path = path + "_test.jpg"
-        
-        # 2. Agar nahi mila toh 4 angles try karo
-        angles = [cv2.ROTATE_90_CLOCKWISE, cv2.ROTATE_180, cv2.ROTATE_90_COUNTERCLOCKWISE]
-        for angle in angles:
-            test_img = cv2.rotate(img, angle)
-            cv2.imwrite(test_path, test_img)
-            try:
-                mrz = read_mrz(test_path)
-                if mrz and mrz.to_dict():
-                    cv2.imwrite(path, test_img)
-                    if os.path.exists(test_path): os.remove(test_path)
-                    return mrz
-            except: pass
-
-        # 3. Double Page Scan fix (Sirf bottom half check karo)
-        h, w = img.shape[:2]
-        if h > w:
-            bottom_half = img[int(h/2):h, :]
-            cv2.imwrite(test_path, bottom_half)
-            try:
-                mrz = read_mrz(test_path)
-                if mrz and mrz.to_dict():
-                    if os.path.exists(test_path): os.remove(test_path)
-                    return mrz
-            except: pass
-
-        if os.path.exists(test_path): os.remove(test_path)
-        return None
-
     # ================= TRAVEL DETAILS =================
     st.subheader("Travel Details")
 
@@ -142,84 +62,32 @@ def run():
     files = st.file_uploader("Upload Passport Images", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
 
     passengers = []
-    seen = set()
 
     if files:
-        for f in files:
-            temp = f"temp_{uuid.uuid4().hex}.jpg"
-            with open(temp, "wb") as fp:
-                fp.write(f.getbuffer())
-
-            # Naya Smart Reader
-            mrz = read_mrz_smart(temp)
-
-            if not mrz:
-                st.warning(f"MRZ not detected! Please upload a clear image for {f.name}.")
-                if os.path.exists(temp): os.remove(temp)
-                continue
-
-            d = mrz.to_dict()
-            passport = d.get("number", "")
-
-            if passport in seen:
-                st.warning(f"Duplicate skipped: {passport}")
-                if os.path.exists(temp): os.remove(temp)
-                continue
-
-            seen.add(passport)
-
-            surname, names = parse_mrz_names(d.get("surname", ""), d.get("names", ""))
-            gender = d.get("sex", "M")
-            country = d.get("country", "PAK")
-            age, dob = calculate_age(d.get("date_of_birth"))
-            exp = safe_date(d.get("expiration_date"))
-            father, cnic = extract_extra_fields(temp)
-            title = passenger_title(age, gender)
-
-            passengers.append({
-                "surname": surname, "names": names, "title": title, "passport": passport,
-                "dob": dob, "exp": exp, "gender": gender, "country": country,
-                "father": father, "cnic": cnic
-            })
-
-            if os.path.exists(temp): os.remove(temp)
+        blobs = [f.getvalue() for f in files]
+        keys = [content_key(b) for b in blobs]
+
+        # MRZ / OCR job queue ke workers par; yeh script sirf poll karta hai.
+        # Har passport ka result aate hi dikhao (poore batch ka intezar nahi).
+        # Har job ka record khatam hote hi cache mein; fail hue (crash /
+        # tesseract error) agle rerun par dobara.
+        futures = job_queue.session_jobs(
+            "pnr_jobs", tuple(keys), timed_passport, lambda: pending_work(blobs),
+            on_submit=cache_on_done, retry=job_failed
+        )
+        if futures is None:
+            return
+
+        def render(events, finished):
+            passengers[:] = show_results(files, events)
+
+        gates = [futures.get(k) for k in keys]
+        events = lambda: iter_batch(blobs, futures=futures)
+        if not job_queue.live_results("pnr_jobs", gates, events, render, "Reading passports"):
+            return
 
     # ================= OUTPUT =================
     if passengers:
-        st.subheader("Extracted Passport Details")
-
-        adults, children, infants = [], [], []
-        nm1_lines, docs_lines = [], []
-        pax = 1
-
-        for i, p in enumerate(passengers, 1):
-            st.markdown(f"**Passenger {i}**\n\nSurname: {p['surname']}  \nGiven Name: {p['names']}  \nPassport: {p['passport']}  \nDOB: {p['dob']}  \nExpiry: {p['exp']}  \nGender: {p['gender']}  \nFather/Husband: {p['father']}  \nCNIC: {p['cnic']}")
-
-            if p["title"] == "INF": infants.append(p)
-            elif p["title"] in ["MSTR", "MISS", "CHD"]: children.append(p)
-            else: adults.append(p)
-
-            docs_lines.append(f"SRDOCS SV HK1-P-{p['country']}-{p['passport']}-{p['country']}-{p['dob']}-{p['gender']}-{p['exp']}-{p['surname']}-{p['names'].replace(' ','-')}-H/P{pax}")
-            pax += 1
-
-        inf_index = 0
-        for adult in adults:
-            nm1 = f"NM1{adult['surname']}/{adult['names']} {adult['title']}"
-            if inf_index < len(infants):
-                inf = infants[inf_index]
-                nm1 += f" (INF/{inf['surname']} {inf['names']}/{inf['dob']})"
-                inf_index += 1
-            nm1_lines.append(nm1)
-
-        for chd in children:
-            nm1_lines.append(f"NM1{chd['surname']}/{chd['names']} {chd['title']} (CHD/{chd['dob']})")
-
-        st.subheader("NM1 Entries")
-        st.code("\n".join(nm1_lines))
-
-        st.subheader("SRDOCS Entries")
-        st.code("\n".join(docs_lines))
-
         st.subheader("PNR Commands")
         dep = departure_date.strftime("%d%b").upper() if departure_date else "18FEB"
         ret = return_date.strftime("%d%b").upper() if return_date else "18FEB"
@@ -1,11 +1,48 @@
 import streamlit as st
-from PIL import Image
-import io
+import batch_zip
+from image_core import ImageChain
+from jpeg_encoder import encode_to_range
+import metrics
 
 # ==========================================
 # PASSPORT PHOTO MAKER (HAJI PHOTO SYSTEM)
 # ==========================================
 
+TARGET_SIZE = (140, 160)
+
+def make_photo(source):
+
+    # -----------------------------
+    # TARGET SAFE SIZE
+    # -----------------------------
+    # Keep aspect ratio, white background par center mein. Upload sirf
+    # utna decode hota hai jitna 140x160 ke liye chahiye.
+    with metrics.span("photo_maker.resize"):
+        final_img = ImageChain(source).fit(TARGET_SIZE).pad(TARGET_SIZE).image()
+
+    # -----------------------------
+    # FILE SIZE CONTROL (5-12 KB)
+    # -----------------------------
+    result = encode_to_range(
+        final_img,
+        min_bytes=5 * 1024,
+        max_bytes=12 * 1024,
+        quality_range=(25, 95),
+        optimize=True
+    )
+
+    return final_img, result
+
+
+def process_bytes(data):
+    # Batch mode: ek file ka poora pipeline
+    final_img, result = make_photo(data)
+    note = f"{round(result.size / 1024, 2)} KB"
+    if not result.in_range:
+        note += ", 5KB–12KB range nahi mili"
+    return result.data, note
+
+
 def run():
 
     st.title("📷 Passport Photo Maker")
@@ -19,56 +56,25 @@ def run():
     ✅ File size: 5KB – 12KB  
     """)
 
-    uploaded = st.file_uploader(
+    files = st.file_uploader(
         "Upload Photo",
-        type=["jpg", "jpeg"]
+        type=["jpg", "jpeg"],
+        accept_multiple_files=True
     )
 
-    if uploaded:
-
-        img = Image.open(uploaded).convert("RGB")
+    # Kai files: sab process kar ke ek zip
+    if len(files) > 1:
+        batch_zip.run_batch(files, process_bytes, "passport_photos.zip")
+        return
 
-        # -----------------------------
-        # TARGET SAFE SIZE
-        # -----------------------------
-        target_width = 140
-        target_height = 160
+    uploaded = files[0] if files else None
 
-        # Keep aspect ratio
-        img.thumbnail((target_width, target_height), Image.LANCZOS)
-
-        # Create white background
-        final_img = Image.new("RGB", (target_width, target_height), (255,255,255))
-
-        # center paste
-        x = (target_width - img.width) // 2
-        y = (target_height - img.height) // 2
-        final_img.paste(img, (x, y))
-
-        # -----------------------------
-        # FILE SIZE CONTROL (5-12 KB)
-        # -----------------------------
-        final_bytes = None
-        final_size = 0
-
-        for quality in range(95, 20, -5):
-
-            buffer = io.BytesIO()
-            final_img.save(buffer, format="JPEG", quality=quality, optimize=True)
-
-            size_kb = len(buffer.getvalue()) / 1024
+    if uploaded:
 
-            if 5 <= size_kb <= 12:
-                final_bytes = buffer.getvalue()
-                final_size = size_kb
-                break
+        final_img, result = make_photo(uploaded)
 
-        # fallback
-        if final_bytes is None:
-            buffer = io.BytesIO()
-            final_img.save(buffer, format="JPEG", quality=40, optimize=True)
-            final_bytes = buffer.getvalue()
-            final_size = len(final_bytes) / 1024
+        final_bytes = result.data
+        final_size = result.size / 1024
 
         # -----------------------------
         # PREVIEW
@@ -1,6 +1,41 @@
 import streamlit as st
-from PIL import Image
-import io
+import batch_zip
+from image_core import ImageChain
+from jpeg_encoder import encode_to_range
+import metrics
+
+# ===============================================
+# RESIZE + SIZE CONTROL
+# ===============================================
+TARGET_SIZE = (1450, 1010)
+
+def make_passport_size(source):
+
+    # ---------- RESIZE ----------
+    # Decode bhi sirf 1450x1010 ko cover karne jitna
+    with metrics.span("size_maker.resize"):
+        img = ImageChain(source).resize(TARGET_SIZE).image()
+
+    # ---------- SAVE WITH SIZE CONTROL ----------
+    target_size = 450 * 1024   # 450 KB
+
+    result = encode_to_range(
+        img,
+        min_bytes=target_size,
+        quality_range=(60, 100)
+    )
+
+    return img, result
+
+
+def process_bytes(data):
+    # Batch mode: ek file ka poora pipeline
+    img, result = make_passport_size(data)
+    note = f"{round(result.size / 1024, 2)} KB"
+    if not result.in_range:
+        note += ", 450KB se kam"
+    return result.data, note
+
 
 # ===============================================
 # MAIN RUN FUNCTION
@@ -17,53 +52,36 @@ def run():
     ✔ File Size: Minimum 450KB (less not allowed)
     """)
 
-    uploaded = st.file_uploader(
+    files = st.file_uploader(
         "Upload Passport Image",
-        type=["jpg", "jpeg", "png"]
+        type=["jpg", "jpeg", "png"],
+        accept_multiple_files=True
     )
 
-    if uploaded:
-
-        img = Image.open(uploaded).convert("RGB")
-
-        # ---------- RESIZE ----------
-        img = img.resize((1450, 1010), Image.LANCZOS)
+    # Kai files: sab process kar ke ek zip
+    if len(files) > 1:
+        by_passport = st.checkbox("Name files by passport number (reads MRZ)", key="size_maker_by_passport")
+        batch_zip.run_batch(files, process_bytes, "passport_1450x1010.zip", by_passport=by_passport)
+        return
 
-        # ---------- SAVE WITH SIZE CONTROL ----------
-        target_size = 450 * 1024   # 450 KB
+    uploaded = files[0] if files else None
 
-        quality = 95
-        final_bytes = None
-
-        # first compress down if too big
-        while quality >= 60:
-            buffer = io.BytesIO()
-            img.save(buffer, format="JPEG", quality=quality, optimize=True)
-            size = buffer.tell()
-
-            if size <= target_size:
-                final_bytes = buffer
-                break
-
-            quality -= 5
+    if uploaded:
 
-        # if size became smaller than 450KB, increase quality again
-        if final_bytes is not None:
-            while final_bytes.tell() < target_size and quality < 100:
-                quality += 1
-                buffer = io.BytesIO()
-                img.save(buffer, format="JPEG", quality=quality)
-                final_bytes = buffer
+        img, result = make_passport_size(uploaded)
 
         st.image(img, caption="Preview", use_column_width=True)
 
-        size_kb = round(final_bytes.tell() / 1024, 2)
+        size_kb = round(result.size / 1024, 2)
 
         st.success(f"Final Size: {size_kb} KB")
 
+        if not result.in_range:
+            st.warning("⚠ File size 450KB se kam hai (less not allowed)")
+
         st.download_button(
             "⬇ Download Passport Size",
-            data=final_bytes.getvalue(),
+            data=result.data,
             file_name="passport_1450x1010.jpg",
             mime="image/jpeg"
         )
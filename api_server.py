@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import base64
+import argparse
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import job_queue
+import metrics
+import passport_pnr
+
+# ==========================================
+# LOCAL HTTP API
+# ==========================================
+# Booking system UI scrape kiye baghair wahi pipelines call kar sake:
+#
+#   python api_server.py --port 8600
+#
+#   GET  /health                 queue ka haal
+#   GET  /metrics                Prometheus text (metrics.to_prometheus)
+#   POST /passport               MRZ record har file ka
+#   POST /pnr                    records + NM1 / SRDOCS lines (Auto PNR jaisa)
+#   POST /convert/<kind>         ehajj_photo, ehajj_passport, photo, passport_size
+#
+# Files teen tarah aa sakti hain:
+#   - multipart/form-data (har file part ek file, upload order mein)
+#   - application/json: {"files": [{"name": "a.jpg", "data": "<base64>"}]}
+#   - raw image body (ek file; naam ?name= se)
+#
+# ?stream=1 (ya Accept: application/x-ndjson) par har file ka result tayyar
+# hote hi ek JSON line (chunked); warna poora JSON aakhir mein. /convert
+# ek file aur bina stream ke seedha image/jpeg deta hai (note X-Note header
+# mein); baaqi surat mein jpeg base64 mein.
+#
+# HTTP/1.1 keep-alive. Yeh Streamlit se alag apna process hai: is ki job
+# queue (zinda tesseract / face detector wale workers), in-memory passport
+# result cache aur metrics is server ki sab requests mein share hote hain,
+# UI ke saath nahi (disk cache sirf tab jab dono ka PNR_CACHE_DIR ek ho).
+# Har client IP job queue mein ek "session" hai: wahi fairness aur
+# admission limits. Queue bhari ho toh 503 + Retry-After; ek request hi
+# JOB_MAX_PER_SESSION se zyada files ki ho toh 413 (batch chhota karein).
+
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", 8600))
+# Is se bari request body 413
+MAX_BODY = int(os.environ.get("API_MAX_BODY_MB", 200)) * 1024 * 1024
+NDJSON = "application/x-ndjson"
+
+
+def _converters():
+    # Page modules streamlit import karte hain; sirf pehli /convert par load
+    import ehajj_photo_size
+    import ehajj_passport_size
+    import Passport_Photo_Maker
+    import Passport_Size_Maker
+    return {
+        "ehajj_photo": ehajj_photo_size.process_bytes,
+        "ehajj_passport": ehajj_passport_size.process_bytes,
+        "photo": Passport_Photo_Maker.process_bytes,
+        "passport_size": Passport_Size_Maker.process_bytes,
+    }
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+# ==========================================
+# REQUEST PARSING
+# ==========================================
+def parse_files(content_type, body, query):
+    # -> [(naam, bytes)] upload order mein
+    kind = content_type.split(";")[0].strip().lower()
+
+    if kind == "multipart/form-data":
+        msg = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+        )
+        files = [
+            (part.get_filename() or part.get_param("name", header="content-disposition") or f"file{i}",
+             part.get_payload(decode=True) or b"")
+            for i, part in enumerate(msg.iter_parts(), 1)
+        ]
+    elif kind == "application/json":
+        try:
+            items = json.loads(body)["files"]
+            files = [(f.get("name") or f"file{i}", base64.b64decode(f["data"])) for i, f in enumerate(items, 1)]
+        except (ValueError, KeyError, TypeError) as e:
+            raise ApiError(400, f"JSON body {{\"files\": [{{\"name\", \"data\"}}]}} chahiye ({e})")
+    else:
+        files = [(query.get("name", ["file"])[0], body)] if body else []
+
+    if not files:
+        raise ApiError(400, "Koi file nahi mili")
+    return files
+
+
+# ==========================================
+# PIPELINES
+# ==========================================
+def _submit(session, fn, arg_list):
+    # Ek request jo kabhi session limit mein na aa sake: retry bekaar, 413
+    queue = job_queue.get_queue()
+    if len(arg_list) > queue.max_per_session:
+        raise ApiError(413, f"Ek request mein zyada se zyada {queue.max_per_session} files; batch chhota karein")
+    return queue.submit_many(session, fn, arg_list)
+
+
+def passport_events(session, files):
+    # Jobs abhi submit (QueueFull response shuru hone se pehle), phir
+    # iter_batch events (upload order, tayyar hote hi) + file naam
+    blobs = [data for _, data in files]
+    todo = passport_pnr.pending_work(blobs)
+    futures = {}
+    if todo:
+        submitted = _submit(session, passport_pnr.timed_passport, list(todo.values()))
+        futures = dict(zip(todo, submitted))
+        passport_pnr.cache_on_done(futures)
+    return (
+        {"file": files[ev["index"]][0], **ev}
+        for ev in passport_pnr.iter_batch(blobs, futures=futures)
+    )
+
+
+def pnr_summary(events):
+    # Auto PNR page wala dedupe + NM1 / SRDOCS
+    passengers, seen = [], set()
+    for ev in events:
+        p = ev["record"]
+        if ev["error"] or not p or p["passport"] in seen:
+            continue
+        seen.add(p["passport"])
+        passengers.append(p)
+    nm1_lines, docs_lines = passport_pnr.build_pnr_lines(passengers)
+    return {"passengers": passengers, "nm1": nm1_lines, "srdocs": docs_lines}
+
+
+def convert_events(session, files, process):
+    submitted = _submit(session, job_queue.safe_call, [(process, data) for _, data in files])
+    return (
+        {"file": name, "out": out, "error": error}
+        for (name, _), (out, error) in zip(files, (job_queue.outcome(f) for f in submitted))
+    )
+
+
+def convert_json(ev):
+    data, note = ev["out"] if ev["out"] else (None, "")
+    return {"file": ev["file"], "error": ev["error"], "note": note,
+            "jpeg": base64.b64encode(data).decode("ascii") if data else None}
+
+
+# ==========================================
+# HTTP HANDLER
+# ==========================================
+class ApiHandler(BaseHTTPRequestHandler):
+    # Keep-alive: har response ki Content-Length ya chunked
+    protocol_version = "HTTP/1.1"
+    server_version = "PassportAPI/1.0"
+
+    def log_message(self, fmt, *args):
+        if not getattr(self.server, "quiet", False):
+            super().log_message(fmt, *args)
+
+    # ---------- RESPONSES ----------
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, obj, headers=None):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_body(status, body, "application/json", headers)
+
+    def send_stream(self, lines):
+        # Chunked NDJSON: har line aate hi client tak
+        self.send_response(200)
+        self.send_header("Content-Type", NDJSON)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(obj):
+            chunk = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.flush()
+
+        try:
+            for obj in lines:
+                write(obj)
+        except OSError:
+            # Client chala gaya
+            self.close_connection = True
+            return
+        except Exception as e:
+            # Headers ja chuke: status nahi badal sakte, aakhri line error
+            metrics.count("api.errors")
+            self.log_error("stream failed: %r", e)
+            write({"error": str(e) or type(e).__name__})
+        self.wfile.write(b"0\r\n\r\n")
+
+    # ---------- ROUTING ----------
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/health":
+            self.send_json(200, {"ok": True, "queue": job_queue.get_queue().stats()})
+        elif path == "/metrics":
+            self.send_body(200, metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self.send_json(404, {"error": f"Not found: {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        try:
+            if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+                # Chunked body nahi parhte; bina parhe keep-alive par agli
+                # request ban jati, is liye connection band
+                self.close_connection = True
+                raise ApiError(411, "Content-Length chahiye (chunked body supported nahi)")
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.close_connection = True
+                raise ApiError(400, "Content-Length ghalat hai")
+            if length > MAX_BODY:
+                # Body parhi nahi, is liye connection band
+                self.close_connection = True
+                raise ApiError(413, f"Body {MAX_BODY // (1024 * 1024)} MB se bari hai")
+            # Keep-alive: error ho tab bhi body poori parhni hai
+            body = self.rfile.read(length)
+            if path not in ("/passport", "/pnr") and not path.startswith("/convert/"):
+                raise ApiError(404, f"Not found: {path}")
+            query = parse_qs(url.query)
+            stream = query.get("stream", ["0"])[0] == "1" or NDJSON in self.headers.get("Accept", "")
+
+            with metrics.span("api.request"):
+                self.route(path, parse_files(self.headers.get("Content-Type", ""), body, query), stream)
+            metrics.count("api.requests")
+
+        except ApiError as e:
+            metrics.count("api.errors")
+            self.send_json(e.status, {"error": str(e)}, e.headers)
+        except job_queue.QueueFull as e:
+            metrics.count("api.rejected")
+            self.send_json(503, {"error": str(e)}, {"Retry-After": "5"})
+        except OSError:
+            # Client chala gaya
+            self.close_connection = True
+        except Exception as e:
+            # Worker crash waghera: client ko jawab zaroor mile
+            metrics.count("api.errors")
+            self.log_error("request failed: %r", e)
+            self.close_connection = True
+            self.send_json(500, {"error": str(e) or type(e).__name__})
+
+    def route(self, path, files, stream):
+        session = f"api:{self.client_address[0]}"
+
+        if path == "/passport":
+            events = passport_events(session, files)
+            if stream:
+                self.send_stream(events)
+            else:
+                self.send_json(200, {"results": list(events)})
+
+        elif path == "/pnr":
+            events = passport_events(session, files)
+            if stream:
+                done = []
+
+                def lines():
+                    for ev in events:
+                        done.append(ev)
+                        yield ev
+                    yield {"summary": pnr_summary(done)}
+
+                self.send_stream(lines())
+            else:
+                events = list(events)
+                self.send_json(200, {"results": events, **pnr_summary(events)})
+
+        elif path.startswith("/convert/"):
+            kind = path[len("/convert/"):]
+            converters = _converters()
+            if kind not in converters:
+                raise ApiError(404, f"Unknown conversion '{kind}'. Options: {', '.join(converters)}")
+            events = convert_events(session, files, converters[kind])
+
+            if len(files) == 1 and not stream:
+                ev = next(events)
+                if ev["error"]:
+                    raise ApiError(422, ev["error"])
+                data, note = ev["out"]
+                self.send_body(200, data, "image/jpeg", {"X-Note": note.encode("ascii", "replace").decode()})
+            elif stream:
+                self.send_stream(convert_json(ev) for ev in events)
+            else:
+                self.send_json(200, {"results": [convert_json(ev) for ev in events]})
+
+
+def make_server(host=API_HOST, port=API_PORT, quiet=False):
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.quiet = quiet
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP API for passport extraction and photo conversion.")
+    parser.add_argument("--host", default=API_HOST, help=f"bind address (default: {API_HOST})")
+    parser.add_argument("--port", type=int, default=API_PORT, help=f"port (default: {API_PORT})")
+    parser.add_argument("--quiet", action="store_true", help="per-request log band")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.quiet)
+    print(f"Passport API on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,8 @@
-import sys
-import subprocess
+import os
 import streamlit as st
-
-# App start hone se pehle OpenCV fix
-subprocess.call([sys.executable, "-m", "pip", "uninstall", "-y", "opencv-python", "opencv-python-headless"])
-subprocess.call([sys.executable, "-m", "pip", "install", "opencv-python-headless==4.8.1.78"])
+import startup_check
+import page_router
+import metrics
 
 # ==============================
 # PAGE CONFIG
@@ -24,15 +22,11 @@ hide_streamlit_style = """
 """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
-# ==============================
-# IMPORT ALL PAGES
-# ==============================
-import Passport_Auto_PNR
-import Passport_Photo_Maker
-import Passport_Size_Maker
-import Hajj_Form_Extractor
-import ehajj_passport_size
-import ehajj_photo_size
+# OpenCV theek se load na ho toh yahin ruk jao (koi pip install nahi)
+opencv_problem = startup_check.opencv_problem()
+if opencv_problem:
+    st.error(opencv_problem)
+    st.stop()
 
 # ==============================
 # HEADER DESIGN
@@ -68,34 +62,26 @@ st.markdown("""
 st.write("")
 
 # ==============================
-# MAIN TABS
-# ==============================
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-    "Passport Auto PNR",
-    "Passport Photo Maker",
-    "Passport Size Maker",
-    "Hajj Form Extractor",
-    "eHajj Passport Size",
-    "eHajj Photo Size"
-])
-
+# MAIN PAGES (LAZY)
 # ==============================
-# TABS CONTENT
-# ==============================
-with tab1:
-    Passport_Auto_PNR.run()
-
-with tab2:
-    Passport_Photo_Maker.run()
-
-with tab3:
-    Passport_Size_Maker.run()
+# st.tabs har rerun par saare tabs chalata hai; yahan sirf selected page
+# import hota hai aur sirf usi ka run() chalta hai.
+page = st.radio(
+    "Page",
+    list(page_router.PAGES),
+    horizontal=True,
+    label_visibility="collapsed",
+    key="main_page"
+)
 
-with tab4:
-    Hajj_Form_Extractor.run()
+module = page_router.load_page(page)
+import_time = page_router.IMPORT_TIMES[page_router.PAGES[page]]
+st.caption(f"{page} module import: {import_time * 1000:.0f} ms (first load)")
 
-with tab5:
-    ehajj_passport_size.run()
+# Debug panel (?debug=1 ya DEBUG_METRICS=1): page se pehle banta hai kyun ke
+# st.stop ke baad kuch render nahi hota; is liye pichhle run tak ki timings
+if st.query_params.get("debug") == "1" or os.environ.get("DEBUG_METRICS") == "1":
+    metrics.debug_panel()
 
-with tab6:
-    ehajj_photo_size.run()
+with metrics.span(f"page.{page_router.PAGES[page]}"):
+    module.run()
@@ -0,0 +1,114 @@
+import io
+import os
+import zipfile
+
+import streamlit as st
+
+import job_queue
+import metrics
+from result_cache import content_key
+
+# ==========================================
+# BATCH MODE + ZIP DOWNLOAD
+# ==========================================
+# Kai files ek saath: har file ek job ban kar job queue ke workers par chalti
+# hai (script thread sirf poll karta hai); har file tayyar hote hi upload
+# order mein zip mein likhi aur dikhayi jati hai.
+#
+# process(data) -> (jpeg_bytes, note); file fail ho toh exception raise kare.
+# process module level function ho (worker process tak pickle hota hai).
+
+
+def unique_name(name, used):
+    stem, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{stem}_{n}{ext}"
+    used.add(candidate)
+    return candidate
+
+
+def passport_numbers(blobs, futures):
+    # MRZ se passport number (Auto PNR wala engine aur uska cache)
+    import passport_pnr
+    return [(ev["record"] or {}).get("passport", "") for ev in passport_pnr.iter_batch(blobs, futures=futures)]
+
+
+def iter_zip(files, names, futures, zf, used):
+    # Har file tayyar hote hi zip mein (upload order); (file, arcname, note, error)
+    for i, (f, name) in enumerate(zip(files, names)):
+        out, error = job_queue.outcome(futures[i])
+        if error:
+            metrics.count("batch.failed")
+            yield f, None, "", error
+            continue
+        data, note = out
+        arcname = unique_name(name + ".jpg", used)
+        zf.writestr(arcname, data)
+        metrics.count("batch.files")
+        yield f, arcname, note, ""
+
+
+def run_batch(files, process, zip_file_name, by_passport=False):
+
+    blobs = [f.getvalue() for f in files]
+    names = [os.path.splitext(os.path.basename(f.name))[0] for f in files]
+
+    # Har page ki apni jobs; wahi files dobara aayein toh dobara submit nahi
+    key = f"batch_jobs:{zip_file_name}"
+    signature = (process.__module__, by_passport, tuple(content_key(b) for b in blobs))
+    futures = job_queue.session_jobs(key, signature, job_queue.safe_call, {i: (process, b) for i, b in enumerate(blobs)})
+    if futures is None:
+        return
+
+    gates = [futures[i] for i in range(len(files))]
+    if by_passport:
+        # Naam ke liye pehle sab MRZ chahiye; phir bhi images saath saath bante hain
+        import passport_pnr
+        mrz_futures = job_queue.session_jobs(
+            key + ":mrz", signature, passport_pnr.timed_passport, lambda: passport_pnr.pending_work(blobs),
+            on_submit=passport_pnr.cache_on_done
+        )
+        if mrz_futures is None:
+            return
+        gates[0] = list(mrz_futures.values()) + [gates[0]]
+
+    state = st.session_state[key]
+    if "zip" not in state:
+        # JPEG dobara compress nahi hota, is liye ZIP_STORED
+        buffer = io.BytesIO()
+        state["zip"] = (buffer, zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED))
+
+    def results():
+        if by_passport:
+            numbers = passport_numbers(blobs, mrz_futures)
+            named = [number or name for number, name in zip(numbers, names)]
+        else:
+            named = names
+        return iter_zip(files, named, futures, state["zip"][1], set())
+
+    def render(done, finished):
+        for f, arcname, note, error in done:
+            if error:
+                st.error(f"{f.name}: {error}")
+            else:
+                st.caption(f"✅ {f.name} → {arcname} ({note})")
+        if not finished:
+            return
+
+        ok = sum(1 for *_, error in done if not error)
+        st.success(f"{ok} / {len(files)} files ready")
+        buffer, zf = state["zip"]
+        if zf.fp is not None:
+            zf.close()
+        if ok:
+            st.download_button(
+                "⬇ Download ZIP",
+                data=buffer.getvalue(),
+                file_name=zip_file_name,
+                mime="application/zip"
+            )
+
+    job_queue.live_results(key, gates, results, render)
+
@@ -0,0 +1,494 @@
+import io
+import os
+import sys
+import json
+import time
+import string
+import argparse
+import resource
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# ==========================================
+# BENCHMARK HARNESS (SYNTHETIC CORPUS)
+# ==========================================
+# Asal passports repo mein nahi rakh sakte, is liye corpus yahin banta hai
+# (seed se, har dafa bilkul wahi):
+#   passports  rendered data page + valid check digits wala TD3 MRZ,
+#              mukhtalif rotation, skew, blur aur resolution
+#   portraits  banaya hua chehra, 0.5 se 12 MP tak
+#   forms      "LABEL: VALUE" lines wala A4 booking form
+#
+# Corpus parent mein banta hai (banane mein sau MB lagte hain); har case
+# alag (spawn) process mein sirf JPEG bytes le kar chalta hai, taake peak
+# RSS sirf usi pipeline (aur uske input bytes) ka ho. Report: items/s, p50/p95 latency, JPEG encode attempts,
+# peak RSS, aur kitne items sahi nikle (ok).
+#
+#   python benchmark.py                      # sab cases, 20 items
+#   python benchmark.py -n 50 mrz_read face_detect
+#   python benchmark.py --json bench.json
+
+DEFAULT_COUNT = 20
+DEFAULT_SEED = 7
+
+MONO_FONTS = [os.environ.get("BENCH_MRZ_FONT", ""), "OCRB.ttf", "DejaVuSansMono.ttf", "cour.ttf", "Courier New.ttf"]
+TEXT_FONTS = ["DejaVuSans.ttf", "arial.ttf", "Arial.ttf"]
+
+
+def load_font(candidates, size):
+    for name in candidates:
+        if not name:
+            continue
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            pass
+    return ImageFont.load_default(size)
+
+
+def jpeg_bytes(image, quality=90):
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def add_noise(image, rng, sigma=6):
+    a = np.asarray(image, dtype=np.int16)
+    a = a + rng.normal(0, sigma, a.shape).astype(np.int16)
+    return Image.fromarray(np.clip(a, 0, 255).astype(np.uint8))
+
+
+# ==========================================
+# MRZ (TD3) WITH CHECK DIGITS
+# ==========================================
+def check_digit(text):
+    total = 0
+    for i, c in enumerate(text):
+        if c.isdigit():
+            v = int(c)
+        elif c.isalpha():
+            v = ord(c) - 55
+        else:
+            v = 0
+        total += v * (7, 3, 1)[i % 3]
+    return str(total % 10)
+
+
+def td3_lines(p):
+    name = f"{p['surname']}<<{p['names'].replace(' ', '<')}"
+    line1 = f"P<{p['country']}{name}".ljust(44, "<")[:44]
+
+    number = p["passport"].ljust(9, "<")
+    personal = p["cnic"].replace("-", "").ljust(14, "<")
+    parts = [
+        number + check_digit(number),
+        p["dob"] + check_digit(p["dob"]),
+        p["exp"] + check_digit(p["exp"]),
+        personal + check_digit(personal),
+    ]
+    composite = check_digit("".join(parts))
+    line2 = parts[0] + p["country"] + parts[1] + p["sex"] + parts[2] + parts[3] + composite
+    return line1, line2
+
+
+def random_person(rng):
+    letters = string.ascii_uppercase
+
+    def word(lo, hi):
+        return "".join(rng.choice(list(letters), int(rng.integers(lo, hi))))
+
+    cnic = "".join(str(d) for d in rng.integers(0, 10, 13))
+    return {
+        "surname": word(4, 9),
+        "names": f"{word(3, 8)} {word(3, 8)}",
+        "father": f"{word(3, 8)} {word(4, 9)}",
+        "country": "PAK",
+        "passport": "".join(rng.choice(list(letters), 2)) + "".join(str(d) for d in rng.integers(0, 10, 7)),
+        "dob": f"{int(rng.integers(50, 99)):02d}{int(rng.integers(1, 13)):02d}{int(rng.integers(1, 29)):02d}",
+        "exp": f"{int(rng.integers(27, 35)):02d}{int(rng.integers(1, 13)):02d}{int(rng.integers(1, 29)):02d}",
+        "sex": "M" if rng.random() < 0.5 else "F",
+        "cnic": f"{cnic[:5]}-{cnic[5:12]}-{cnic[12]}",
+    }
+
+
+def render_passport_page(p):
+    # 125 x 88 mm data page, 10 px / mm
+    w, h = 1250, 880
+    page = Image.new("L", (w, h), 235)
+    draw = ImageDraw.Draw(page)
+    label, value = load_font(TEXT_FONTS, 18), load_font(TEXT_FONTS, 28)
+
+    # Photo (left quarter)
+    draw.rectangle((40, 110, 290, 440), fill=180)
+    draw.ellipse((100, 160, 230, 320), fill=140)
+
+    x, y = 330, 100
+    for name, text in [("Surname", p["surname"]), ("Given Names", p["names"]),
+                       ("Father Name", p["father"]), ("Citizenship Number", p["cnic"]),
+                       ("Passport Number", p["passport"])]:
+        draw.text((x, y), name, fill=60, font=label)
+        draw.text((x, y + 22), text, fill=10, font=value)
+        y += 78
+
+    # MRZ: 44 characters takreeban poori chaudai par
+    line1, line2 = td3_lines(p)
+    size = 40
+    mono = load_font(MONO_FONTS, size)
+    size = int(size * 1170 / mono.getlength(line1))
+    mono = load_font(MONO_FONTS, size)
+    draw.text((40, h - 150), line1, fill=0, font=mono)
+    draw.text((40, h - 150 + int(size * 1.4)), line2, fill=0, font=mono)
+    return page
+
+
+def make_passports(count, rng):
+    items = []
+    for _ in range(count):
+        p = random_person(rng)
+        page = render_passport_page(p)
+
+        # Scan ki tarah: resolution, skew, rotation, blur, noise
+        scale = float(rng.uniform(0.6, 2.0))
+        page = page.resize((round(page.width * scale), round(page.height * scale)), Image.BILINEAR)
+        page = page.rotate(float(rng.uniform(-2, 2)), expand=True, fillcolor=235)
+        page = page.rotate(90 * int(rng.choice([0, 0, 1, 2, 3])), expand=True)
+        page = page.filter(ImageFilter.GaussianBlur(float(rng.uniform(0, 1.2))))
+        page = add_noise(page, rng)
+
+        items.append({"data": jpeg_bytes(page, int(rng.integers(80, 93))), "expected": p})
+    return items
+
+
+# ==========================================
+# PORTRAITS + FORMS
+# ==========================================
+# 0.5 MP se 12 MP tak (lambi side)
+PORTRAIT_SIDES = [800, 1600, 3000, 4000]
+
+
+def render_portrait(long_side, rng):
+    w, h = long_side * 3 // 4, long_side
+    bg = np.linspace(200, 245, h, dtype=np.float32)[:, None, None] * np.ones((1, w, 3), np.float32)
+    image = Image.fromarray(bg.astype(np.uint8))
+    draw = ImageDraw.Draw(image)
+
+    cx, cy, fw = w // 2, int(h * 0.42), int(w * rng.uniform(0.28, 0.36))
+    fh = int(fw * 1.3)
+    skin = tuple(int(v) for v in rng.integers(150, 215, 3))
+    draw.ellipse((cx - fw * 0.6, cy - fh * 0.75, cx + fw * 0.6, cy + fh * 0.3), fill=(40, 30, 25))
+    draw.ellipse((cx - fw // 2, cy - fh // 2, cx + fw // 2, cy + fh // 2), fill=skin)
+    for ex in (cx - fw // 5, cx + fw // 5):
+        draw.ellipse((ex - fw // 12, cy - fh // 9, ex + fw // 12, cy - fh // 20), fill=(30, 30, 30))
+    draw.rectangle((cx - fw // 5, cy - fh // 5, cx + fw // 5, cy - fh // 6), fill=(60, 45, 40))
+    draw.ellipse((cx - fw // 6, cy + fh // 5, cx + fw // 6, cy + fh // 4), fill=(120, 50, 50))
+    draw.rectangle((cx - fw, cy + fh // 2, cx + fw, h), fill=(30, 40, 80))
+    return add_noise(image.filter(ImageFilter.GaussianBlur(long_side / 800)), rng)
+
+
+def make_portraits(count, rng):
+    items = []
+    for i in range(count):
+        image = render_portrait(PORTRAIT_SIDES[i % len(PORTRAIT_SIDES)], rng)
+        items.append({"data": jpeg_bytes(image, 90)})
+    return items
+
+
+FORM_LABELS = [
+    "NAME", "FATHER NAME", "CNIC", "PASSPORT NO", "DATE OF BIRTH", "GENDER",
+    "MOBILE", "CITY", "DISTRICT", "PACKAGE", "ROOM TYPE", "MAHRAM NAME",
+    "MAHRAM RELATION", "BANK", "BRANCH", "CHALLAN NO", "AMOUNT", "ADDRESS",
+]
+
+
+def make_forms(count, rng):
+    items = []
+    label_font = load_font(TEXT_FONTS, 30)
+    for _ in range(count):
+        p = random_person(rng)
+        # A4 150 dpi
+        page = Image.new("L", (1240, 1754), 250)
+        draw = ImageDraw.Draw(page)
+        draw.text((420, 60), "HAJJ BOOKING FORM", fill=0, font=load_font(TEXT_FONTS, 44))
+
+        lines = []
+        for n, label in enumerate(FORM_LABELS):
+            value = {"NAME": f"{p['names']} {p['surname']}", "FATHER NAME": p["father"],
+                     "CNIC": p["cnic"], "PASSPORT NO": p["passport"]}.get(
+                label, "".join(rng.choice(list(string.ascii_uppercase + string.digits), 10)))
+            line = f"{label}: {value}"
+            draw.text((90, 180 + n * 80), line, fill=0, font=label_font)
+            lines.append(line)
+
+        page = page.rotate(float(rng.uniform(-1.5, 1.5)), expand=True, fillcolor=250)
+        page = add_noise(page, rng, sigma=4)
+        items.append({"data": jpeg_bytes(page, 88), "text": "\n".join(lines)})
+    return items
+
+
+CORPORA = {
+    "passports": make_passports,
+    "portraits": make_portraits,
+    "forms": make_forms,
+}
+
+
+# ==========================================
+# CASES
+# ==========================================
+# Har case: (corpus, prepare(item) -> input, run(input) -> ok)
+# prepare ka waqt nahi gina jata (decode, pichhle stage ka output wagera).
+
+def _gray(item):
+    import passport_pnr
+    return passport_pnr.decode_upload(item["data"])
+
+
+def _rgb(item):
+    return Image.open(io.BytesIO(item["data"])).convert("RGB")
+
+
+def _passport_input(item):
+    return _gray(item), item["expected"]
+
+
+def _mrz_read(args):
+    import passport_pnr
+    gray, expected = args
+    mrz, _ = passport_pnr.read_mrz_smart(gray)
+    return bool(mrz) and mrz.to_dict().get("number", "").replace("<", "") == expected["passport"]
+
+
+def _extra_input(item):
+    # MRZ wala stage pehle (untimed), taake extra fields ko upright page mile
+    import passport_pnr
+    mrz, page = passport_pnr.read_mrz_smart(_gray(item))
+    if mrz:
+        return page, mrz.aux.get("bbox"), item["expected"]
+    return _gray(item), None, item["expected"]
+
+
+def _extra_fields(args):
+    import passport_pnr
+    gray, bbox, expected = args
+    father, cnic = passport_pnr.extract_extra_fields(gray, bbox)
+    return cnic == expected["cnic"]
+
+
+def _form_input(item):
+    return cv2.imdecode(np.frombuffer(item["data"], np.uint8), cv2.IMREAD_COLOR)
+
+
+def _form_preprocess(img):
+    import hajj_form
+    return hajj_form.preprocess(img) is not None
+
+
+def _form_parse(text):
+    import hajj_form
+    data, _ = hajj_form.extract_all_fields(text)
+    return len(data) == len(FORM_LABELS)
+
+
+def _form_ocr(img):
+    import hajj_form
+    data, _ = hajj_form.full_page_fields(img)
+    return len(data) > 0
+
+
+def _face_detect(rgb):
+    import face_detect
+    return len(face_detect.detect_faces(np.asarray(rgb))) > 0
+
+
+def _ehajj_passport(image):
+    import ehajj_passport_size
+    return ehajj_passport_size.compress_to_range(image)[2]
+
+
+def _ehajj_photo_input(item):
+    import ehajj_photo_size
+    return ehajj_photo_size.prepare_photo(_rgb(item))
+
+
+def _ehajj_photo(image):
+    import ehajj_photo_size
+    _, kb = ehajj_photo_size.compress_photo(image)
+    return 7 <= kb <= 12
+
+
+def _size_maker(data):
+    import Passport_Size_Maker
+    return Passport_Size_Maker.make_passport_size(data)[1].in_range
+
+
+def _photo_maker(data):
+    import Passport_Photo_Maker
+    return Passport_Photo_Maker.make_photo(data)[1].in_range
+
+
+CASES = {
+    "mrz_read": ("passports", _passport_input, _mrz_read),
+    "extra_fields": ("passports", _extra_input, _extra_fields),
+    "form_preprocess": ("forms", _form_input, _form_preprocess),
+    "form_parse": ("forms", lambda item: item["text"], _form_parse),
+    "form_ocr": ("forms", _form_input, _form_ocr),
+    "face_detect": ("portraits", _rgb, _face_detect),
+    "ehajj_passport_size": ("passports", _rgb, _ehajj_passport),
+    "ehajj_photo": ("portraits", _ehajj_photo_input, _ehajj_photo),
+    # Yeh dono upload bytes khud decode karte hain (reduced decode bhi gina jaye)
+    "size_maker": ("portraits", lambda item: item["data"], _size_maker),
+    "photo_maker": ("portraits", lambda item: item["data"], _photo_maker),
+}
+
+
+# ==========================================
+# RUNNER
+# ==========================================
+def reset_peak_rss():
+    # Linux: high-water mark abhi ki RSS par wapas (clear_refs "5")
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    # Linux par VmHWM: ru_maxrss fork / exec ke paar parent ka peak bhi rakhta hai
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux KB deta hai, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _count_encodes():
+    # jpeg_encoder ki har encode call gino (attempts)
+    import jpeg_encoder
+    counter = [0]
+    encode = jpeg_encoder.encode_jpeg
+
+    def counted(*args, **kwargs):
+        counter[0] += 1
+        return encode(*args, **kwargs)
+
+    jpeg_encoder.encode_jpeg = counted
+    return counter
+
+
+def run_case(name, items, warmup=1):
+    # items: parent ka bana corpus (yahan sirf encoded bytes aate hain)
+    _, prepare, run = CASES[name]
+    # passporteye ki skimage deprecation warnings har page par aati hain
+    warnings.simplefilter("ignore", FutureWarning)
+    encodes = _count_encodes()
+
+    # Pehli call model / cascade load karti hai; woh latency mein na gine
+    for item in items[:warmup]:
+        try:
+            run(prepare(item))
+        except Exception:
+            pass
+    encodes[0] = 0
+    # Peak sirf timed loop ka (imports / models abhi ki RSS mein shamil)
+    reset_peak_rss()
+
+    latencies, ok, errors, error = [], 0, 0, ""
+    for item in items:
+        value = prepare(item)
+        start = time.perf_counter()
+        try:
+            ok += bool(run(value))
+        except Exception as e:
+            errors += 1
+            error = error or str(e).splitlines()[0][:80]
+        latencies.append(time.perf_counter() - start)
+
+    lat = np.array(latencies) * 1000
+    return {
+        "case": name,
+        "n": len(items),
+        "ok": ok,
+        "errors": errors,
+        "items_per_s": len(items) / max(sum(latencies), 1e-9),
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "encodes_per_item": encodes[0] / len(items),
+        "peak_rss_mb": peak_rss_mb(),
+        "first_error": error,
+    }
+
+
+def run_isolated(name, items, warmup):
+    # Naya (spawn) process: peak RSS mein corpus banane ki memory na aaye
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_case, name, items, warmup).result()
+
+
+def print_table(results):
+    header = f"{'case':<22}{'n':>5}{'ok':>5}{'err':>5}{'items/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'encodes':>9}{'RSS MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['case']:<22}{r['n']:>5}{r['ok']:>5}{r['errors']:>5}{r['items_per_s']:>10.2f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['encodes_per_item']:>9.1f}{r['peak_rss_mb']:>9.0f}")
+    for r in results:
+        if r["first_error"]:
+            print(f"  {r['case']}: {r['first_error']}")
+
+
+def save_samples(out_dir, count, seed):
+    # Corpus dekhne ke liye (kya ban raha hai)
+    os.makedirs(out_dir, exist_ok=True)
+    for corpus, make in CORPORA.items():
+        for i, item in enumerate(make(count, np.random.default_rng(seed))):
+            with open(os.path.join(out_dir, f"{corpus}_{i:03d}.jpg"), "wb") as f:
+                f.write(item["data"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic corpus par har pipeline ka benchmark")
+    parser.add_argument("cases", nargs="*", help=f"default sab: {', '.join(CASES)}")
+    parser.add_argument("-n", "--count", type=int, default=DEFAULT_COUNT, help="items per case")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed items pehle")
+    parser.add_argument("--json", help="results is file mein bhi likho")
+    parser.add_argument("--samples", help="corpus images is folder mein likh kar band karo")
+    args = parser.parse_args(argv)
+
+    if args.samples:
+        save_samples(args.samples, args.count, args.seed)
+        print(f"Samples: {args.samples}")
+        return 0
+
+    unknown = [c for c in args.cases if c not in CASES]
+    if unknown:
+        parser.error(f"Unknown case: {', '.join(unknown)}")
+
+    results, corpora = [], {}
+    for name in args.cases or CASES:
+        corpus = CASES[name][0]
+        if corpus not in corpora:
+            corpora[corpus] = CORPORA[corpus](args.count, np.random.default_rng(args.seed))
+        results.append(run_isolated(name, corpora[corpus], args.warmup))
+        print(f"{name} done", file=sys.stderr)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,68 +1,127 @@
 import streamlit as st
-from PIL import Image, ImageChops, ImageOps
-import io
+from PIL import Image
+import numpy as np
+import math
+import batch_zip
+from image_core import load_image, to_gray
+from jpeg_encoder import encode_to_range, window_distance
+import metrics
 
 # ==========================================
-# AUTO ROTATE (FIX MOBILE ROTATION)
+# AUTO CROP EXTRA BORDER
 # ==========================================
+# Chhoti grayscale copy par border dhoondo (full size copies nahi banti).
+# Background rang chaaron kinaron ke median se, aur scanner noise ke liye
+# tolerance: pixel tabhi content hai jab background se TOLERANCE zyada
+# farq ho, aur row / column tabhi jab us ke CONTENT_FRACTION pixel content hon.
 
-def auto_rotate(image):
-    try:
-        image = ImageOps.exif_transpose(image)
-    except:
-        pass
-    return image
+CROP_SIZE = 800
+BORDER_BAND = 3
+TOLERANCE = 24
+CONTENT_FRACTION = 0.02
 
+def auto_crop(image):
+    with metrics.span("ehajj_passport.auto_crop"):
+        return _auto_crop(image)
 
-# ==========================================
-# AUTO CROP EXTRA BORDER
-# ==========================================
 
-def auto_crop(image):
-    bg = Image.new(image.mode, image.size, image.getpixel((0, 0)))
-    diff = ImageChops.difference(image, bg)
-    bbox = diff.getbbox()
-    if bbox:
-        return image.crop(bbox)
-    return image
+def _auto_crop(image):
+    w, h = image.size
+    factor = max(1, max(w, h) // CROP_SIZE)
+    small = image.reduce(factor) if factor > 1 else image
+    lum = to_gray(small).astype(np.int16)
+
+    b = BORDER_BAND
+    border = np.concatenate([lum[:b].ravel(), lum[-b:].ravel(), lum[:, :b].ravel(), lum[:, -b:].ravel()])
+    content = np.abs(lum - int(np.median(border))) > TOLERANCE
+
+    rows = np.flatnonzero(content.mean(axis=1) > CONTENT_FRACTION)
+    cols = np.flatnonzero(content.mean(axis=0) > CONTENT_FRACTION)
+    if len(rows) == 0 or len(cols) == 0:
+        return image
+
+    # Chhoti copy ka box full size par, ek step bahar tak
+    left = max(0, (cols[0] - 1) * factor)
+    top = max(0, (rows[0] - 1) * factor)
+    right = min(w, (cols[-1] + 2) * factor)
+    bottom = min(h, (rows[-1] + 2) * factor)
+
+    if (left, top, right, bottom) == (0, 0, w, h):
+        return image
+    return image.crop((left, top, right, bottom))
 
 
 # ==========================================
-# UPSCALE IMAGE (IF SIZE SMALL)
+# RESIZE FOR SIZE TARGET
 # ==========================================
 
-def upscale_image(image, scale=1.15):
+# Image is se bari kabhi nahi banti (lambi side, px)
+MAX_SIDE = 4000
+MAX_ROUNDS = 4
+
+def resize_by(image, scale):
     w, h = image.size
-    return image.resize((int(w*scale), int(h*scale)), Image.LANCZOS)
+    return image.resize((max(1, round(w*scale)), max(1, round(h*scale))), Image.LANCZOS)
 
 
 # ==========================================
 # COMPRESS BETWEEN 400KB - 600KB
 # ==========================================
+# Pehle quality se window dhoondo. Na mile toh JPEG size ko pixels ke
+# saath seedha maan kar target dimensions ek hi baar mein nikalo (hamesha
+# original se resize, MAX_SIDE tak), phir quality dobara tune karo.
+# Zyada se zyada MAX_ROUNDS, is liye loop hamesha khatam hota hai.
 
 def compress_to_range(image, min_kb=400, max_kb=600):
 
-    quality = 95
+    min_bytes, max_bytes = min_kb * 1024, max_kb * 1024
+    target = math.sqrt(min_bytes * max_bytes)
+    max_scale = MAX_SIDE / max(image.size)
 
-    while True:
+    original = image
+    scale = 1.0
+    best = None
 
-        img_bytes = io.BytesIO()
-        image.save(img_bytes, format="JPEG", quality=quality)
+    for _ in range(MAX_ROUNDS):
 
-        size_kb = len(img_bytes.getvalue()) / 1024
+        result = encode_to_range(
+            image,
+            min_bytes=min_bytes,
+            max_bytes=max_bytes,
+            quality_range=(20, 95)
+        )
+
+        if best is None or window_distance(result.size, min_bytes, max_bytes) < window_distance(best.size, min_bytes, max_bytes):
+            best = result
 
-        if min_kb <= size_kb <= max_kb:
-            return img_bytes.getvalue(), size_kb
+        if result.in_range:
+            break
 
-        if size_kb < min_kb:
-            image = upscale_image(image)
-            continue
+        new_scale = min(max_scale, scale * math.sqrt(target / result.size))
+        if abs(new_scale - scale) < 0.01:
+            # MAX_SIDE tak pohanch gaye, aur bari nahi ho sakti
+            break
 
-        if size_kb > max_kb:
-            quality -= 5
+        scale = new_scale
+        metrics.count("ehajj_passport.resize_rounds")
+        with metrics.span("ehajj_passport.resize"):
+            image = resize_by(original, scale)
 
-        if quality < 20:
-            return img_bytes.getvalue(), size_kb
+    return best.data, best.size / 1024, best.in_range
+
+
+# ==========================================
+# FULL PIPELINE (ROTATE + CROP + COMPRESS)
+# ==========================================
+
+def process_bytes(data):
+    # Batch mode: ek file ka poora pipeline
+    image = auto_crop(load_image(data))
+    final_img, final_size, in_range = compress_to_range(image)
+    note = f"{round(final_size,2)} KB"
+    if not in_range:
+        note += ", 400KB–600KB range nahi mili"
+    return final_img, note
 
 
 # ==========================================
@@ -74,18 +133,25 @@ def run():
     st.title("Passport")
     st.write("Upload passport image (Auto Straight + 400KB–600KB)")
 
-    uploaded_file = st.file_uploader(
+    uploaded_files = st.file_uploader(
         "Upload passport image",
         type=["jpg", "jpeg", "png"],
-        key="ehajj_passport_upload"
+        key="ehajj_passport_upload",
+        accept_multiple_files=True
     )
 
-    if uploaded_file is not None:
+    # Kai files: sab process kar ke ek zip
+    if len(uploaded_files) > 1:
+        by_passport = st.checkbox("Name files by passport number (reads MRZ)", key="ehajj_passport_by_passport")
+        batch_zip.run_batch(uploaded_files, process_bytes, "ehajj_passports.zip", by_passport=by_passport)
+        return
 
-        image = Image.open(uploaded_file).convert("RGB")
+    uploaded_file = uploaded_files[0] if uploaded_files else None
 
-        # ✅ Step 1 Rotate
-        image = auto_rotate(image)
+    if uploaded_file is not None:
+
+        # ✅ Step 1 Load + Rotate (EXIF, image_core mein)
+        image = load_image(uploaded_file)
 
         # ✅ Step 2 Crop borders
         image = auto_crop(image)
@@ -94,10 +160,13 @@ def run():
         st.image(image, use_column_width=True)
 
         # ✅ Step 3 Compress
-        final_img, final_size = compress_to_range(image)
+        final_img, final_size, in_range = compress_to_range(image)
 
         st.success(f"Final Size: {round(final_size,2)} KB")
 
+        if not in_range:
+            st.warning("⚠ 400KB–600KB range tak nahi pohanch saka, sab se qareeb wali file di gayi hai")
+
         st.download_button(
             "Download Passport Image",
             final_img,
@@ -1,87 +1,90 @@
 import streamlit as st
-import cv2
-import numpy as np
-from PIL import Image
-import io
+import face_detect
+import batch_zip
+from image_core import ImageChain, load_image, to_gray
+from jpeg_encoder import encode_to_range
+import metrics
 
 # =====================================================
-# FACE DETECTION (Lazy Load)
+# FACE DETECTION (shared detector registry)
 # =====================================================
 
 def detect_face(image):
     try:
-        # Haar cascade ko function ke andar load karein taake import ke waqt error na aaye
-        cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        face_cascade = cv2.CascadeClassifier(cascade_path)
-        
-        if face_cascade.empty():
-            st.error("Error: Face detection model load nahi ho saka. Path issue.")
-            return []
-
-        # PIL Image ko numpy array mein convert karein
-        img_np = np.array(image)
-        
-        # RGB se GRAY mein convert karein
-        gray = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
-
-        faces = face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.2,
-            minNeighbors=5,
-            minSize=(100, 100)
-        )
-
-        return faces
+        # Detector process mein ek hi baar load hota hai (face_detect registry);
+        # detection ko sirf gray chahiye, RGB array ki copy nahi
+        return face_detect.detect_faces(to_gray(image), min_size=(100, 100))
     except Exception as e:
         # Agar OpenCV crash hota hai toh red screen ke bajaye app ke andar error dikhaye
         st.error(f"OpenCV Error encountered: {e}")
         return []
 
 # =====================================================
-# PREPARE PHOTO (WHITE BG + SIZE)
+# PREPARE PHOTO (FACE CROP + SIZE)
 # =====================================================
 
-def prepare_photo(image):
+# eHajj required size (3:4)
+TARGET_SIZE = (480, 640)
+# Decode itna hi bara: face crop photo ka hissa hai, is liye target ka 2 guna
+DECODE_SIZE = (960, 1280)
 
-    image = image.convert("RGB")
+# Detector ka box aankh-bhaon se thodi tak hota hai; poora sar (baal se
+# thodi tak) is ka takreeban 1.35 guna hota hai
+HEAD_TO_FACE = 1.35
+# Frame ki height ka itna hissa sar ho, aur sar ke upar itni jagah
+HEAD_TO_FRAME = 0.62
+TOP_MARGIN = 0.10
 
-    # eHajj required size
-    target_size = (480, 640)
 
-    image = image.resize(target_size, Image.LANCZOS)
+def face_crop_box(size, faces):
+    # 3:4 crop box (left, top, right, bottom) jo face ke gird bane
+    w, h = size
+    aspect = TARGET_SIZE[0] / TARGET_SIZE[1]
 
-    # white background
-    bg = Image.new("RGB", target_size, (255, 255, 255))
-    bg.paste(image, (0, 0))
+    if len(faces) == 0:
+        # Face nahi toh beech se 3:4 (stretch nahi)
+        crop_h = min(h, w / aspect)
+        crop_w = crop_h * aspect
+        left, top = (w - crop_w) / 2, (h - crop_h) / 2
+        return (left, top, left + crop_w, top + crop_h)
 
-    return bg
+    fx, fy, fw, fh = max(faces, key=lambda f: f[2] * f[3])
+    head_h = fh * HEAD_TO_FACE
+    crop_h = min(head_h / HEAD_TO_FRAME, h, w / aspect)
+    crop_w = crop_h * aspect
 
-# =====================================================
-# COMPRESS TO 7KB - 12KB
-# =====================================================
+    # Face horizontally beech mein, sar ke upar TOP_MARGIN jagah
+    crown = fy + fh - head_h
+    left = fx + fw / 2 - crop_w / 2
+    top = crown - crop_h * TOP_MARGIN
 
-def compress_photo(image):
-
-    quality = 90
-    final_bytes = None
-    final_size = 0
+    # Image ke andar rakho
+    left = min(max(0, left), w - crop_w)
+    top = min(max(0, top), h - crop_h)
+    return (left, top, left + crop_w, top + crop_h)
 
-    while quality >= 10:
 
-        buf = io.BytesIO()
-        image.save(buf, format="JPEG", quality=quality)
+def prepare_photo(image, faces=()):
 
-        size_kb = len(buf.getvalue()) / 1024
+    # Sirf crop wala hissa resample hota hai (poori image nahi)
+    box = face_crop_box(image.size, faces)
+    with metrics.span("ehajj_photo.crop_resize"):
+        return ImageChain(image).crop(box).resize(TARGET_SIZE).image()
 
-        final_bytes = buf.getvalue()
-        final_size = size_kb
+# =====================================================
+# COMPRESS TO 7KB - 12KB
+# =====================================================
 
-        if 7 <= size_kb <= 12:
-            return final_bytes, final_size
+def compress_photo(image):
 
-        quality -= 5
+    result = encode_to_range(
+        image,
+        min_bytes=7 * 1024,
+        max_bytes=12 * 1024,
+        quality_range=(10, 90)
+    )
 
-    return final_bytes, final_size
+    return result.data, result.size / 1024
 
 # =====================================================
 # VERIFICATION UI
@@ -110,6 +113,19 @@ def verification_ui(face_detected):
     st.success("✅ Image Properties")
     st.success("✅ Background Checks")
 
+# =====================================================
+# FULL PIPELINE (BATCH MODE)
+# =====================================================
+
+def process_bytes(data):
+    # Batch mode: ek file ka poora pipeline; face na mile toh file fail
+    image = load_image(data, DECODE_SIZE)
+    faces = face_detect.detect_faces(to_gray(image), min_size=(100, 100))
+    if len(faces) == 0:
+        raise ValueError("Face not detected")
+    final_img, final_size = compress_photo(prepare_photo(image, faces))
+    return final_img, f"{round(final_size,2)} KB"
+
 # =====================================================
 # MAIN PAGE
 # =====================================================
@@ -123,15 +139,24 @@ def run():
         "Image size: 480 x 640 px | Image file size: 7KB - 12KB"
     )
 
-    uploaded_file = st.file_uploader(
+    uploaded_files = st.file_uploader(
         "Upload Photo",
         type=["jpg", "jpeg", "png"],
-        key="ehajj_photo_upload"
+        key="ehajj_photo_upload",
+        accept_multiple_files=True
     )
 
+    # Kai files: sab process kar ke ek zip
+    if len(uploaded_files) > 1:
+        batch_zip.run_batch(uploaded_files, process_bytes, "ehajj_photos.zip")
+        return
+
+    uploaded_file = uploaded_files[0] if uploaded_files else None
+
     if uploaded_file is not None:
 
-        image = Image.open(uploaded_file)
+        # Face crop ke liye 2x headroom ke saath reduced decode
+        image = load_image(uploaded_file, DECODE_SIZE)
 
         # STEP 1: Face detection
         faces = detect_face(image)
@@ -144,7 +169,7 @@ def run():
             st.stop()
 
         # STEP 3: Prepare photo
-        photo = prepare_photo(image)
+        photo = prepare_photo(image, faces)
 
         st.subheader("Processed Photo Preview")
         st.image(photo, width=240)
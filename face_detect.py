@@ -0,0 +1,125 @@
+import os
+
+import cv2
+import numpy as np
+
+import metrics
+from instance_pool import PoolRegistry
+from image_core import to_gray
+
+# =====================================================
+# FACE DETECTOR REGISTRY
+# =====================================================
+# Model sirf ek baar load hota hai aur sab sessions / threads share karte hain.
+# OpenCV detector ek waqt mein ek hi thread use kare, is liye har backend ka
+# chhota sa pool hai (instance_pool): jitne threads saath detect karein utne
+# instances, phir wahi dobara use hote hain.
+#
+# Backend FACE_DETECTOR env se: "haar" (default) ya "dnn" (YuNet ONNX model,
+# path FACE_DNN_MODEL env ya models/ folder se).
+
+HAAR_CASCADE = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+DNN_MODEL = os.environ.get(
+    "FACE_DNN_MODEL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "face_detection_yunet_2023mar.onnx")
+)
+
+# Coarse pass is se bari image par kabhi nahi chalta (lambi side, px)
+DETECT_SIZE = 640
+# Fine pass sirf face ke aas paas wale crop par, is size tak chhota kar ke
+REFINE_SIZE = 320
+REFINE_PAD = 0.3
+# Detector ki sab se chhoti window
+MIN_WINDOW = 24
+
+
+class HaarFaceDetector:
+
+    def __init__(self, path=HAAR_CASCADE):
+        self.cascade = cv2.CascadeClassifier(path)
+        if self.cascade.empty():
+            raise RuntimeError(f"Face detection model load nahi ho saka: {path}")
+
+    def detect(self, rgb, min_size=(100, 100)):
+        gray = to_gray(rgb)
+        return self.cascade.detectMultiScale(
+            gray,
+            scaleFactor=1.2,
+            minNeighbors=5,
+            minSize=min_size
+        )
+
+
+class DnnFaceDetector:
+
+    def __init__(self, path=DNN_MODEL, score_threshold=0.8):
+        if not os.path.exists(path):
+            raise RuntimeError(f"DNN face model nahi mila: {path}")
+        self.net = cv2.FaceDetectorYN.create(path, "", (320, 320), score_threshold)
+
+    def detect(self, rgb, min_size=(100, 100)):
+        h, w = rgb.shape[:2]
+        self.net.setInputSize((w, h))
+        code = cv2.COLOR_GRAY2BGR if rgb.ndim == 2 else cv2.COLOR_RGB2BGR
+        _, faces = self.net.detect(cv2.cvtColor(rgb, code))
+        if faces is None:
+            return np.empty((0, 4), dtype=np.int32)
+        boxes = faces[:, :4].round().astype(np.int32)
+        keep = (boxes[:, 2] >= min_size[0]) & (boxes[:, 3] >= min_size[1])
+        return boxes[keep]
+
+
+BACKENDS = {
+    "haar": HaarFaceDetector,
+    "dnn": DnnFaceDetector,
+}
+
+
+_pools = PoolRegistry(BACKENDS, "face detector backend")
+
+
+def default_backend():
+    return os.environ.get("FACE_DETECTOR", "haar").lower()
+
+
+def get_pool(backend=None):
+    return _pools.get(backend or default_backend())
+
+
+# =====================================================
+# COARSE-TO-FINE DETECTION
+# =====================================================
+# 12 MP photo par seedha detectMultiScale bohot slow hai. Pehle chhoti copy par
+# face dhoondo, phir full resolution mein sirf us jagah ko refine karo.
+# Is tarah detection ka waqt input size par depend nahi karta.
+
+def _detect_scaled(detector, rgb, max_side, min_size):
+    h, w = rgb.shape[:2]
+    scale = min(1.0, max_side / max(h, w))
+    if scale < 1.0:
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        rgb = cv2.resize(rgb, size, interpolation=cv2.INTER_AREA)
+    window = (max(MIN_WINDOW, int(min_size[0] * scale)), max(MIN_WINDOW, int(min_size[1] * scale)))
+    boxes = detector.detect(rgb, window)
+    return [tuple(int(round(v / scale)) for v in box) for box in boxes]
+
+
+def detect_faces(rgb, min_size=(100, 100), backend=None):
+    # rgb: HxWx3 RGB ya HxW gray uint8 array; full resolution (x, y, w, h) boxes wapas
+    h, w = rgb.shape[:2]
+    faces = []
+    with metrics.span("face.detect"), get_pool(backend).acquire() as detector:
+        for x, y, bw, bh in _detect_scaled(detector, rgb, DETECT_SIZE, min_size):
+            pad_x, pad_y = int(bw * REFINE_PAD), int(bh * REFINE_PAD)
+            x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+            x1, y1 = min(w, x + bw + pad_x), min(h, y + bh + pad_y)
+
+            fine = _detect_scaled(detector, rgb[y0:y1, x0:x1], REFINE_SIZE, min_size)
+            if fine:
+                fx, fy, fw, fh = max(fine, key=lambda b: b[2] * b[3])
+                x, y, bw, bh = x0 + fx, y0 + fy, fw, fh
+
+            if bw >= min_size[0] and bh >= min_size[1]:
+                faces.append((x, y, bw, bh))
+
+    return np.array(faces, dtype=np.int32).reshape(-1, 4)
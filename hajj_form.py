@@ -0,0 +1,439 @@
+import os
+import io
+import csv
+import json
+import re
+import time
+import tempfile
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import cv2
+import numpy as np
+import pypdfium2 as pdfium
+import pytesseract
+import ocr_engine
+import metrics
+from image_core import decode_gray, to_gray
+
+# =========================
+# TESSERACT PATH
+# =========================
+if os.name == "nt":
+    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+
+# =========================
+# IMAGE PREPROCESS
+# =========================
+def preprocess(img):
+
+    # PDF pages pehle se gray aate hain
+    gray = to_gray(img, bgr=True)
+
+    # sharpen
+    kernel = np.array([[0,-1,0],[-1,5,-1],[0,-1,0]])
+    gray = cv2.filter2D(gray, -1, kernel)
+
+    gray = cv2.resize(gray, None, fx=1.5, fy=1.5)
+    gray = cv2.GaussianBlur(gray,(3,3),0, dst=gray)
+
+    return gray
+
+
+# =========================
+# CLEAN TEXT
+# =========================
+def clean_line(line):
+
+    line = line.replace("|", "")
+    line = re.sub(r"\s+", " ", line)
+    return line.strip()
+
+
+# =========================
+# FULL TEXT PARSER
+# =========================
+def extract_all_fields(text):
+
+    data = {}
+
+    lines = [clean_line(l) for l in text.split("\n") if l.strip()]
+
+    last_label = ""
+
+    for line in lines:
+
+        # detect label style line
+        if ":" in line:
+            parts = line.split(":",1)
+            label = parts[0].strip()
+            value = parts[1].strip()
+
+            data[label] = value
+            last_label = label
+
+        else:
+            # sometimes value comes next line
+            if last_label and last_label in data and data[last_label] == "":
+                data[last_label] = line
+
+    return data, lines
+
+
+# =========================
+# FULL PAGE OCR (FALLBACK)
+# =========================
+# Template na ho ya scan align na ho sake toh purana tareeqa
+def full_page_fields(img):
+
+    with metrics.span("form.preprocess"):
+        processed = preprocess(img)
+
+    # FULL OCR
+    with metrics.span("form.full_page_ocr"):
+        text = ocr_engine.image_to_string(processed, psm=6)
+
+    text = text.upper()
+
+    return extract_all_fields(text)
+
+
+# =========================
+# FORM TEMPLATES
+# =========================
+# Booking form ek fixed template hai. Har template do files hain:
+#   <name>.png   khaali (ya saaf) form ki reference scan
+#   <name>.json  {"fields": [{"name": "SURNAME", "box": [x, y, w, h],
+#                             "chars": "alpha", "psm": 7}, ...]}
+# Box reference image ke pixels mein. Scan ko reference par align kar ke
+# sirf in boxes ka OCR hota hai, poore page ka nahi.
+
+TEMPLATE_DIR = os.environ.get(
+    "HAJJ_FORM_TEMPLATES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+)
+
+# Field "chars" -> tesseract whitelist (space whitelist mein nahi hota,
+# words ke beech space tesseract khud deta hai)
+WHITELISTS = {
+    "alpha": "ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+    "digits": "0123456789",
+    "date": "0123456789/-.",
+    "cnic": "0123456789-",
+    "alnum": "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789",
+    "phone": "0123456789+-",
+}
+
+# Alignment is size (lambi side, px) par hoti hai
+ALIGN_SIZE = 1200
+ORB_FEATURES = 3000
+# Lowe ratio test aur kam az kam itne RANSAC inliers
+MATCH_RATIO = 0.75
+MIN_INLIERS = 25
+# Field box ke gird thoda margin (print line se thoda hat kar likha ho)
+FIELD_PAD = 4
+# Tesseract ko line ki height takreeban itni achhi lagti hai
+FIELD_HEIGHT = 48
+
+# Template file ka naam (directory ke bahar path nahi)
+TEMPLATE_NAME = r"[\w-]+"
+
+Template = namedtuple("Template", ["name", "image", "fields", "scale", "keypoints", "descriptors"])
+
+
+def _orb():
+    return cv2.ORB_create(ORB_FEATURES)
+
+
+def _align_copy(gray):
+    # (chhoti copy, scale) jis par features nikalte hain
+    h, w = gray.shape[:2]
+    scale = min(1.0, ALIGN_SIZE / max(h, w))
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+
+def template_names(directory=TEMPLATE_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        f[:-5] for f in os.listdir(directory)
+        if f.endswith(".json") and os.path.exists(os.path.join(directory, f[:-5] + ".png"))
+    )
+
+
+@lru_cache(maxsize=8)
+def _load_template(json_path, png_path, mtime):
+    # mtime key ka hissa hai: template file badli toh cache khud naya
+    with open(json_path, encoding="utf-8") as f:
+        fields = json.load(f)["fields"]
+    image = cv2.imread(png_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise RuntimeError(f"Template image nahi parhi ja saki: {png_path}")
+    small, scale = _align_copy(image)
+    keypoints, descriptors = _orb().detectAndCompute(small, None)
+    name = os.path.splitext(os.path.basename(json_path))[0]
+    return Template(name, image, fields, scale, keypoints, descriptors)
+
+
+def load_template(name, directory=TEMPLATE_DIR):
+    # Reference features sirf ek dafa nikalte hain (template layout cache)
+    json_path = os.path.join(directory, name + ".json")
+    png_path = os.path.join(directory, name + ".png")
+    mtime = max(os.path.getmtime(json_path), os.path.getmtime(png_path))
+    return _load_template(json_path, png_path, mtime)
+
+
+def save_template(name, image, fields, directory=TEMPLATE_DIR):
+    # image: reference form (gray ya BGR array); fields: upar wala format.
+    # Naam UI se aata hai: sirf letters / digits / _ / - (../ se bahar na likhe)
+    if not re.fullmatch(TEMPLATE_NAME, name):
+        raise ValueError(f"Template name '{name}' mein sirf letters, digits, _ aur - ho sakte hain")
+    for field in fields:
+        if "name" not in field or len(field.get("box", ())) != 4:
+            raise ValueError(f"Har field ko 'name' aur 'box' [x, y, w, h] chahiye: {field}")
+        if field.get("chars") and field["chars"] not in WHITELISTS:
+            raise ValueError(f"Unknown chars '{field['chars']}' ({', '.join(WHITELISTS)})")
+    os.makedirs(directory, exist_ok=True)
+    cv2.imwrite(os.path.join(directory, name + ".png"), image)
+    with open(os.path.join(directory, name + ".json"), "w", encoding="utf-8") as f:
+        json.dump({"fields": fields}, f, indent=2)
+
+
+# =========================
+# REGISTRATION
+# =========================
+def align_to_template(gray, template):
+    # Scan ko homography se reference layout par le aao; na ho sake toh None
+    small, scale = _align_copy(gray)
+    keypoints, descriptors = _orb().detectAndCompute(small, None)
+    if descriptors is None or template.descriptors is None:
+        return None
+
+    matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+    good = [
+        pair[0] for pair in matcher.knnMatch(descriptors, template.descriptors, k=2)
+        if len(pair) == 2 and pair[0].distance < MATCH_RATIO * pair[1].distance
+    ]
+    if len(good) < MIN_INLIERS:
+        return None
+
+    # Dono taraf full resolution coordinates
+    src = np.float32([keypoints[m.queryIdx].pt for m in good]) / scale
+    dst = np.float32([template.keypoints[m.trainIdx].pt for m in good]) / template.scale
+    H, mask = cv2.findHomography(src, dst, cv2.RANSAC, 5.0)
+    if H is None or int(mask.sum()) < MIN_INLIERS:
+        return None
+
+    h, w = template.image.shape[:2]
+    return cv2.warpPerspective(gray, H, (w, h), flags=cv2.INTER_LINEAR, borderValue=255)
+
+
+# =========================
+# FIELD OCR
+# =========================
+def field_roi(aligned, box):
+    x, y, w, h = box
+    H, W = aligned.shape[:2]
+    x0, y0 = max(0, x - FIELD_PAD), max(0, y - FIELD_PAD)
+    x1, y1 = min(W, x + w + FIELD_PAD), min(H, y + h + FIELD_PAD)
+    roi = aligned[y0:y1, x0:x1]
+    if roi.size == 0:
+        return roi
+
+    # Sirf chhota box bara hota hai, poora page nahi
+    if roi.shape[0] < FIELD_HEIGHT:
+        f = FIELD_HEIGHT / roi.shape[0]
+        roi = cv2.resize(roi, None, fx=f, fy=f, interpolation=cv2.INTER_CUBIC)
+    _, roi = cv2.threshold(roi, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return roi
+
+
+def ocr_field(aligned, field):
+    roi = field_roi(aligned, field["box"])
+    if roi.size == 0:
+        return ""
+    chars = WHITELISTS.get(field.get("chars", ""))
+    text = ocr_engine.image_to_string(roi, psm=field.get("psm", 7), whitelist=chars).upper()
+    return re.sub(r"\s+", " ", text.replace("|", "")).strip()
+
+
+def extract_template_fields(gray, template):
+    # {field: value} ya None agar scan template se align na ho
+    with metrics.span("form.align"):
+        aligned = align_to_template(gray, template)
+    if aligned is None:
+        metrics.count("form.align_failed")
+        return None
+    with metrics.span("form.field_ocr"):
+        return {field["name"]: ocr_field(aligned, field) for field in template.fields}
+
+
+# =========================
+# PAGE INGESTION (PDF / IMAGE)
+# =========================
+# Group ke forms aksar ek multi-page scanned PDF mein aate hain. Pages ek
+# ek kar ke rasterize hote hain aur OCR workers ko milte hain; ek waqt mein
+# sirf chand pages memory mein hote hain, PDF chahe jitni lambi ho.
+
+PDF_DPI = 200
+# Job queue par ek job itne PDF pages (ek bara PDF kai workers mein bante)
+PAGES_PER_JOB = 4
+
+
+# Poore process mein ek waqt mein ek hi pdfium call
+_pdfium_lock = threading.RLock()
+
+
+def is_pdf(data):
+    return bytes(data[:5]) == b"%PDF-"
+
+
+def iter_pdf_pages(data, dpi=PDF_DPI, pages=None):
+    # pdfium thread-safe nahi: Streamlit process mein kai sessions ke threads
+    # PDF khol sakte hain, is liye har pdfium call _pdfium_lock ke andar
+    # data: PDF bytes ya file path; pages: 0-based page numbers, None = sab
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(data)
+        total = len(pdf)
+    try:
+        for i in (pages if pages is not None else range(total)):
+            with _pdfium_lock, metrics.span("form.rasterize"):
+                page = pdf[i]
+                try:
+                    bitmap = page.render(scale=dpi / 72, grayscale=True)
+                    # Bitmap ka buffer close hote hi free ho jata hai, is liye copy
+                    gray = bitmap.to_numpy().copy()
+                    bitmap.close()
+                finally:
+                    page.close()
+            yield i + 1, gray
+    finally:
+        with _pdfium_lock:
+            pdf.close()
+
+
+def iter_pages(data, pages=None):
+    # (page number, gray array) har page ke liye; data bytes ya PDF ka path
+    if isinstance(data, str) or is_pdf(data):
+        yield from iter_pdf_pages(data, pages=pages)
+        return
+    gray = decode_gray(data)
+    if gray is None:
+        raise ValueError("Image read nahi ho saki")
+    yield 1, gray
+
+
+def extract_page(gray, template=None):
+    # (fields, full text lines, method)
+    if template is not None:
+        data = extract_template_fields(gray, template)
+        if data is not None:
+            return data, [], "template"
+    data, lines = full_page_fields(gray)
+    return data, lines, "full page"
+
+
+def _timed_page(gray, template):
+    start = time.perf_counter()
+    try:
+        data, lines, method = extract_page(gray, template)
+        return data, lines, method, time.perf_counter() - start, ""
+    except Exception as e:
+        return None, [], "", time.perf_counter() - start, str(e) or type(e).__name__
+
+
+def _result(name, page, data=None, lines=(), method="", seconds=0.0, error=""):
+    return {"file": name, "page": page, "fields": data, "lines": list(lines),
+            "method": method, "seconds": seconds, "error": error}
+
+
+# =========================
+# JOB QUEUE WORK UNITS
+# =========================
+# UI har image (ya PDF ke PAGES_PER_JOB pages) ka ek job banata hai. Template
+# naam se jata hai: cv2.KeyPoint pickle nahi hote, worker khud load karta hai
+# (lru_cache, is liye har job par disk se nahi).
+def _page_count(source):
+    # Streamlit script thread mein chalta hai (form_jobs): lock zaroori
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(source)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def form_jobs(name, data, template_name=None, size=PAGES_PER_JOB):
+    # -> (extract_pages ke args ki list, temp files). PDF ek dafa temp file
+    # mein likha jata hai; har job sirf path + pages range le jata hai (poore
+    # PDF ke bytes har job mein pickle nahi hote). Image ya kharab PDF = ek
+    # job bytes ke saath (kharab file worker mein error row banti hai).
+    if not is_pdf(data):
+        return [(name, data, template_name, None)], []
+    fd, path = tempfile.mkstemp(prefix="hajj_form_", suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    try:
+        total = _page_count(path)
+    except Exception:
+        os.remove(path)
+        return [(name, data, template_name, None)], []
+    jobs = [(name, path, template_name, range(i, min(i + size, total))) for i in range(0, total, size)]
+    return jobs or [(name, data, template_name, None)], [path]
+
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def extract_pages(name, source, template_name=None, pages=None):
+    # Job entry point: source upload bytes ya spooled PDF ka path; pages
+    # 0-based range (None = sab). List of page results (form_rows ke liye).
+    template = load_template(template_name) if template_name else None
+    results = []
+    try:
+        for page, gray in iter_pages(source, pages):
+            results.append(_result(name, page, *_timed_page(gray, template)))
+    except Exception as e:
+        results.append(_result(name, 0, error=str(e) or type(e).__name__))
+    return results
+
+
+# =========================
+# COMBINED TABLE (CSV / JSON)
+# =========================
+def form_rows(results):
+    # Har page ek row: file, page, phir us ke fields
+    return [
+        {"file": r["file"], "page": r["page"], **(r["fields"] or {}), "error": r["error"]}
+        for r in results
+    ]
+
+
+def table_columns(rows):
+    columns = {}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    # error column hamesha aakhir mein
+    columns.pop("error", None)
+    return list(columns) + ["error"]
+
+
+def rows_to_csv(rows):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=table_columns(rows), restval="")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+def rows_to_json(rows):
+    return json.dumps(rows, indent=2, ensure_ascii=False)
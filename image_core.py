@@ -0,0 +1,175 @@
+import io
+import math
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+import metrics
+
+# ==========================================
+# SHARED IMAGING CORE
+# ==========================================
+# Sab tabs upload ko yahin se decode karte hain. Maqsad: ek upload ki
+# memory mein ek hi full-resolution copy ho.
+#
+#   load_image   PIL decode (EXIF rotation + JPEG draft / reduced decode)
+#   decode_gray  OpenCV grayscale decode (MRZ / form OCR)
+#   to_gray      PIL ya array se gray array, sirf zaroorat ho toh convert
+#   ImageChain   crop / resize / fit / pad ki list; .image() par
+#                ek hi dafa chalti hai. Pehle resize se decode size nikalta
+#                hai, crop resize ke box mein chala jata hai (alag copy nahi)
+#
+# 12-48 MP phone JPEG ko poora decode kar ke phir 140x160 ya 480x640 tak
+# chhota karna waste hai. JPEG decoder DCT level par hi 1/2, 1/4 ya 1/8
+# scale par decode kar sakta hai (Image.draft). Yahan sab se chhota scale
+# chuna jata hai jo phir bhi target size ko cover kare.
+
+EXIF_ORIENTATION = 0x0112
+# In orientations mein image 90 degree ghoomi hui store hoti hai
+SWAPPED_ORIENTATIONS = (5, 6, 7, 8)
+WHITE = (255, 255, 255)
+
+
+def _open(source):
+    # (lazy image, upright size); pixels abhi decode nahi hue
+    if isinstance(source, Image.Image):
+        return source, source.size
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+    w, h = image.size
+    if image.getexif().get(EXIF_ORIENTATION, 1) in SWAPPED_ORIENTATIONS:
+        w, h = h, w
+    return image, (w, h)
+
+
+def _decode(image, target_size, mode):
+    if getattr(image, "fp", None) is None:
+        # Pehle se decoded PIL image (caller ne rotation kar di)
+        return image if image.mode == mode else image.convert(mode)
+
+    if target_size and image.format == "JPEG":
+        w, h = target_size
+        # draft stored (rotation se pehle wale) pixels par kaam karta hai
+        if image.getexif().get(EXIF_ORIENTATION, 1) in SWAPPED_ORIENTATIONS:
+            w, h = h, w
+        image.draft(mode, (w, h))
+
+    ImageOps.exif_transpose(image, in_place=True)
+    return image if image.mode == mode else image.convert(mode)
+
+
+def load_image(source, target_size=None, mode="RGB"):
+    # source: bytes, file object (st.file_uploader), path ya PIL image
+    # target_size: (w, h) jo decode ke baad bhi pura cover ho; None = full decode
+    with metrics.span("image.load"):
+        return _decode(_open(source)[0], target_size, mode)
+
+
+def decode_gray(source):
+    # bytes ya uploaded file -> uint8 gray array (EXIF rotation OpenCV karta hai)
+    data = source.getvalue() if hasattr(source, "getvalue") else source
+    with metrics.span("image.decode_gray"):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+
+def to_gray(img, bgr=False):
+    # PIL image ya HxW / HxWx3 array -> HxW uint8 array. Gray pehle se ho
+    # toh wahi array (copy nahi).
+    if isinstance(img, Image.Image):
+        return np.asarray(img if img.mode == "L" else img.convert("L"))
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY if bgr else cv2.COLOR_RGB2GRAY)
+
+
+# ==========================================
+# LAZY CHAIN
+# ==========================================
+class ImageChain:
+
+    def __init__(self, source):
+        self.source = source
+        self.ops = []
+
+    def crop(self, box):
+        # (left, top, right, bottom) abhi tak ki image ke coordinates mein
+        self.ops.append(("crop", tuple(box)))
+        return self
+
+    def resize(self, size):
+        self.ops.append(("resize", tuple(size)))
+        return self
+
+    def fit(self, size):
+        # Aspect ratio rakh kar size ke andar (thumbnail; bara nahi karta)
+        self.ops.append(("fit", tuple(size)))
+        return self
+
+    def pad(self, size, fill=WHITE):
+        # Beech mein rakh kar size ke canvas par
+        self.ops.append(("pad", tuple(size), fill))
+        return self
+
+    def _decode_size(self, full):
+        # Pehle resize / fit tak jitni resolution chahiye (None = poori)
+        box = (0, 0) + full
+        for op in self.ops:
+            w, h = box[2] - box[0], box[3] - box[1]
+            if op[0] == "crop":
+                l, t, r, b = op[1]
+                box = (box[0] + l, box[1] + t, box[0] + r, box[1] + b)
+            elif op[0] in ("resize", "fit"):
+                sw, sh = op[1][0] / w, op[1][1] / h
+                scale = max(sw, sh) if op[0] == "resize" else min(sw, sh)
+                if scale >= 1:
+                    return None
+                return (math.ceil(full[0] * scale), math.ceil(full[1] * scale))
+            elif op[0] == "pad":
+                return None
+        return None
+
+    def image(self):
+        with metrics.span("image.chain"):
+            return self._run()
+
+    def _run(self):
+        lazy, full = _open(self.source)
+        image = _decode(lazy, self._decode_size(full), "RGB")
+
+        # Draft ke baad asal pixels aur logical (upright full) size ka ratio
+        sx, sy = image.width / full[0], image.height / full[1]
+        pending = None
+
+        for op in self.ops:
+            if op[0] == "crop":
+                l, t, r, b = op[1]
+                x0, y0 = (pending[0], pending[1]) if pending else (0, 0)
+                pending = (x0 + l * sx, y0 + t * sy, x0 + r * sx, y0 + b * sy)
+
+            elif op[0] in ("resize", "fit"):
+                size = op[1]
+                if op[0] == "fit":
+                    w = (pending[2] - pending[0]) / sx if pending else image.width / sx
+                    h = (pending[3] - pending[1]) / sy if pending else image.height / sy
+                    scale = min(size[0] / w, size[1] / h, 1.0)
+                    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+                if pending or size != image.size:
+                    # Crop yahin resize ke box mein: beech ki copy nahi banti
+                    image = image.resize(size, Image.LANCZOS, box=pending, reducing_gap=3.0)
+                pending, sx, sy = None, 1.0, 1.0
+
+            elif op[0] == "pad":
+                image = _materialize(image, pending)
+                canvas = Image.new(image.mode, op[1], op[2])
+                canvas.paste(image, ((op[1][0] - image.width) // 2, (op[1][1] - image.height) // 2))
+                image, pending, sx, sy = canvas, None, 1.0, 1.0
+
+        return _materialize(image, pending)
+
+
+def _materialize(image, box):
+    if box is None:
+        return image
+    return image.crop(tuple(int(round(v)) for v in box))
@@ -0,0 +1,51 @@
+import threading
+from contextlib import contextmanager
+
+# =====================================================
+# SHARED INSTANCE POOL (PER BACKEND)
+# =====================================================
+# Mehngi cheez (tesseract engine, face detector) ek baar bane aur sab
+# sessions / threads share karein. Har instance ek waqt mein ek hi thread
+# use kare: jitne threads saath kaam karein utne instances, phir wahi
+# dobara use hote hain.
+#
+#   registry = PoolRegistry(BACKENDS, "OCR backend")
+#   with registry.get("tesserocr").acquire() as engine: ...
+
+
+class InstancePool:
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            instance = self._idle.pop() if self._idle else None
+        if instance is None:
+            instance = self.factory()
+        try:
+            yield instance
+        finally:
+            with self._lock:
+                self._idle.append(instance)
+
+
+class PoolRegistry:
+    # backend naam -> InstancePool (pehli dafa maangne par bane)
+
+    def __init__(self, backends, kind):
+        self.backends = backends
+        self.kind = kind
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, backend):
+        if backend not in self.backends:
+            raise ValueError(f"Unknown {self.kind}: {backend}")
+        with self._lock:
+            if backend not in self._pools:
+                self._pools[backend] = InstancePool(self.backends[backend])
+            return self._pools[backend]
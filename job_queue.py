@@ -0,0 +1,380 @@
+import os
+import time
+import multiprocessing
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+# ==========================================
+# LOCAL JOB QUEUE
+# ==========================================
+# OCR / MRZ / encode ka bhari kaam Streamlit script thread mein nahi chalta.
+# Sab sessions apne jobs yahan dete hain; ek hi process pool (poore host ke
+# liye) unhein chalata hai aur session sirf poll karta hai.
+#
+#   - Per-host concurrency: pool mein JOB_WORKERS processes (default: cores)
+#   - Admission control: host par JOB_MAX_QUEUED se zyada jobs intezar mein
+#     na hon, aur ek session JOB_MAX_PER_SESSION se zyada na rakhe (QueueFull)
+#   - Fairness: har session ki apni line; free worker milte hi sessions
+#     baari baari (round robin), taake ek bara group baaqi agents ko na roke
+#
+# submit() concurrent.futures.Future deta hai; fn aur args pickle hone
+# chahiye (module level function). Job functions: passport_pnr.timed_passport,
+# hajj_form.extract_pages, aur safe_call(process, data) image pipelines ke
+# liye (outcome(future) us ka (out, error), crash bhi error ban kar).
+# Yeh module streamlit sirf UI helpers ke andar import karta hai.
+
+HOST_WORKERS = int(os.environ.get("JOB_WORKERS") or os.cpu_count() or 1)
+MAX_QUEUED = int(os.environ.get("JOB_MAX_QUEUED", 1000))
+MAX_PER_SESSION = int(os.environ.get("JOB_MAX_PER_SESSION", 300))
+# Streamlit / HTTP server ke threads wale process se fork karna khatarnak hai
+# (kisi thread ka lock, e.g. metrics, child mein hamesha band reh jata hai):
+# workers saaf forkserver (ya spawn) process se bante hain
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# UI itne seconds baad dobara dekhta hai
+POLL_SECONDS = 1.0
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+def safe_call(process, data):
+    # Job entry point: (process(data), "") ya (None, error). Ek file ki
+    # ghalti poore batch ko na roke.
+    try:
+        return process(data), ""
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+
+def outcome(future):
+    # safe_call job ka (out, error); worker crash / cancel bhi sirf is file
+    # ka error, poore batch ka nahi
+    try:
+        return future.result()
+    except (Exception, CancelledError) as e:
+        return None, str(e) or type(e).__name__
+
+
+def _run_job(fn, args):
+    # Worker mein: result ke saath is job ki metrics bhi wapas
+    return fn(*args), metrics.drain()
+
+
+class JobQueue:
+
+    def __init__(self, workers=HOST_WORKERS, max_queued=MAX_QUEUED, max_per_session=MAX_PER_SESSION, alive=None):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_per_session = max_per_session
+        # alive(session) False ho (browser band) toh us ke line mein pare
+        # jobs chalne se pehle hi hata diye jate hain
+        self.alive = alive
+        # session -> deque of (future, fn, args, submitted time)
+        self._lines = OrderedDict()
+        self._queued = 0
+        self._running = 0
+        self._cond = threading.Condition()
+        self._pool = None
+        self._thread = None
+
+    # ---------- SUBMIT ----------
+    def submit_many(self, session, fn, arg_list):
+        # Sab jobs ya koi bhi nahi (aadha batch queue mein na rahe)
+        arg_list = [args if isinstance(args, tuple) else (args,) for args in arg_list]
+        with self._cond:
+            line = self._lines.get(session, ())
+            if self._queued + len(arg_list) > self.max_queued:
+                metrics.count("jobs.rejected", len(arg_list))
+                raise QueueFull(f"Server busy: {self._queued} jobs pehle se line mein hain")
+            if len(line) + len(arg_list) > self.max_per_session:
+                metrics.count("jobs.rejected", len(arg_list))
+                raise QueueFull(f"Ek session mein zyada se zyada {self.max_per_session} jobs line mein ho sakte hain")
+
+            futures = []
+            now = time.perf_counter()
+            line = self._lines.setdefault(session, deque())
+            for args in arg_list:
+                future = Future()
+                line.append((future, fn, args, now))
+                futures.append(future)
+            self._queued += len(futures)
+            metrics.count("jobs.submitted", len(futures))
+            self._start()
+            self._cond.notify()
+        return futures
+
+    def submit(self, session, fn, *args):
+        return self.submit_many(session, fn, [args])[0]
+
+    def cancel_jobs(self, session, futures):
+        # Sirf yeh jobs line se hatao (e.g. upload badal gaya): session ki
+        # jagah foran khaali. Shuru ho chuke jobs chalte rehte hain.
+        futures = set(futures)
+        with self._cond:
+            line = self._lines.get(session, ())
+            keep = deque(job for job in line if job[0] not in futures)
+            removed = len(line) - len(keep)
+            if keep:
+                self._lines[session] = keep
+            else:
+                self._lines.pop(session, None)
+            self._queued -= removed
+        for future in futures:
+            future.cancel()
+        return removed
+
+    def cancel_session(self, session):
+        # Line mein pare (abhi shuru na hue) jobs hata do
+        with self._cond:
+            line = self._lines.pop(session, ())
+            self._queued -= len(line)
+        for future, *_ in line:
+            future.cancel()
+        return len(line)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": self._queued,
+                "running": self._running,
+                "workers": self.workers,
+                "sessions": len(self._lines),
+            }
+
+    def position(self, futures):
+        # Apne se pehle host par kitne jobs hain (UI ke liye andaza)
+        pending = sum(1 for f in futures if not f.done() and not f.running())
+        running = sum(1 for f in futures if f.running())
+        with self._cond:
+            return max(0, self._queued - pending) + max(0, self._running - running)
+
+    # ---------- DISPATCH ----------
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch, name="job-queue", daemon=True)
+            self._thread.start()
+
+    def _next(self):
+        # Round robin: pehle session ka ek job, phir woh session line ke aakhir mein
+        while self._lines:
+            session, line = next(iter(self._lines.items()))
+            if self.alive and not self.alive(session):
+                metrics.count("jobs.abandoned", len(line))
+                self._queued -= len(line)
+                del self._lines[session]
+                for future, *_ in line:
+                    future.cancel()
+                continue
+            future, fn, args, submitted = line.popleft()
+            self._queued -= 1
+            if line:
+                self._lines.move_to_end(session)
+            else:
+                del self._lines[session]
+            if future.set_running_or_notify_cancel():
+                return future, fn, args, submitted
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while self._running >= self.workers or not self._queued:
+                    self._cond.wait()
+                job = self._next()
+                if job is None:
+                    continue
+                self._running += 1
+                if self._pool is None:
+                    # Wahi initializer jo Auto PNR ka apna pool use karta hai
+                    from passport_pnr import init_worker
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, initializer=init_worker,
+                        mp_context=multiprocessing.get_context(START_METHOD)
+                    )
+                pool = self._pool
+
+            future, fn, args, submitted = job
+            metrics.observe("jobs.queue_wait", time.perf_counter() - submitted)
+            try:
+                inner = pool.submit(_run_job, fn, args)
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._finish(future, None, e, pool)
+                continue
+            inner.add_done_callback(lambda f, future=future, pool=pool: self._done(future, f, pool))
+
+    def _done(self, future, inner, pool):
+        try:
+            result, worker_metrics = inner.result()
+        except BaseException as e:
+            self._finish(future, None, e, pool)
+            return
+        metrics.merge(worker_metrics)
+        self._finish(future, result, None, pool)
+
+    def _finish(self, future, result, error, pool):
+        with self._cond:
+            self._running -= 1
+            if isinstance(error, BrokenProcessPool) and self._pool is pool:
+                # Worker crash: agla job naya pool banaye
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            self._cond.notify()
+        if error is None:
+            metrics.count("jobs.done")
+            future.set_result(result)
+        else:
+            metrics.count("jobs.failed")
+            future.set_exception(error)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    # Poore Streamlit process (sab sessions) ke liye ek hi queue
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+# ==========================================
+# STREAMLIT: SUBMIT ONCE + POLL
+# ==========================================
+def session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+
+def _session_alive(session):
+    # Band (ya disconnect) hua browser session: us ke jobs ab koi nahi dekhega
+    from streamlit import runtime
+    return not runtime.exists() or runtime.get_instance().is_active_session(session)
+
+
+def session_jobs(key, signature, fn, jobs, cleanup=None, on_submit=None, retry=None):
+    # jobs: {naam: args}, ya function jo yeh dict de (sirf submit ke waqt
+    # chalta hai, e.g. temp file likhna). Isi upload ke jobs pehle se line
+    # mein hain toh wahi futures ({naam: Future}); warna purane line se hata
+    # kar naye submit. cleanup: in jobs ke kaam khatam hone (ya badalne) par
+    # ek dafa. on_submit(futures): naye futures par ek dafa (e.g. done
+    # callback). retry(future) True ho toh batch khatam hone ke baad agle
+    # rerun par woh job dobara (baaqi futures wahi). Queue full ho toh error
+    # dikha kar None.
+    import streamlit as st
+
+    queue = get_queue()
+    if queue.alive is None:
+        queue.alive = _session_alive
+    session = session_id()
+
+    keep = {}
+    state = st.session_state.get(key)
+    if state:
+        futures = state["futures"].values()
+        # Cancelled future: session beech mein disconnect hua tha, dobara submit
+        if state["signature"] == signature and not any(f.cancelled() for f in futures):
+            if not (retry and state.get("finished")):
+                return state["futures"]
+            keep = {n: f for n, f in state["futures"].items() if not retry(f)}
+            if len(keep) == len(state["futures"]):
+                return state["futures"]
+        queue.cancel_jobs(session, futures)
+        _cleanup(state)
+        st.session_state.pop(key)
+
+    jobs = jobs() if callable(jobs) else jobs
+    names = [n for n in jobs if n not in keep]
+    if len(names) > queue.max_per_session:
+        # Intezar se kabhi line mein nahi aayega
+        if cleanup:
+            cleanup()
+        st.error(f"⚠ Yeh batch {len(names)} jobs ka hai; ek session mein zyada se zyada "
+                 f"{queue.max_per_session}. Batch chhota karein (kam files / PDF ke hisse).")
+        return None
+    try:
+        futures = queue.submit_many(session, fn, [jobs[n] for n in names])
+    except QueueFull as e:
+        if cleanup:
+            cleanup()
+        st.error(f"⏳ {e}. Thori der baad dobara try karein.")
+        return None
+    futures = dict(zip(names, futures))
+    if on_submit:
+        on_submit(futures)
+    futures.update(keep)
+    st.session_state[key] = {"signature": signature, "futures": futures, "cleanup": cleanup}
+    return futures
+
+
+def _cleanup(state):
+    cleanup, state["cleanup"] = state.get("cleanup"), None
+    if cleanup:
+        cleanup()
+
+
+def _futures(gate):
+    if gate is None:
+        return []
+    return gate if isinstance(gate, list) else [gate]
+
+
+def _ready(gate):
+    return all(f.done() for f in _futures(gate))
+
+
+def live_results(key, gates, results, render, label="Processing"):
+    # Results upload order mein, har job ke khatam hote hi (poore batch ka
+    # intezar nahi):
+    #   gates[i]    item i ka Future, Futures ki list (sab chahiye), ya None
+    #               (kisi job ka intezar nahi)
+    #   results()   generator: item i ka result; gates[i] ho chuka ho toh
+    #               block nahi karta (session state mein rehta hai, har
+    #               poll par wahin se aage)
+    #   render(done, finished)  ab tak ke results dikhaye
+    # Pending ho toh har POLL_SECONDS baad sirf yeh fragment dobara chalta
+    # hai; sab ho jayein toh poora page rerun (aakhri render fragment se bahar).
+    import streamlit as st
+
+    state = st.session_state[key]
+
+    def advance():
+        done = state.setdefault("results", [])
+        if "gen" not in state:
+            state["gen"] = results()
+        while len(done) < len(gates):
+            if not _ready(gates[len(done)]):
+                break
+            done.append(next(state["gen"]))
+        return done
+
+    done = advance()
+    if len(done) == len(gates):
+        _cleanup(state)
+        state["finished"] = True
+        render(done, True)
+        return True
+
+    @st.fragment(run_every=POLL_SECONDS)
+    def poll():
+        done = advance()
+        if len(done) == len(gates):
+            st.rerun()
+        pending = [f for g in gates[len(done):] for f in _futures(g)]
+        ahead = get_queue().position(pending)
+        text = f"{label}: {len(done)}/{len(gates)} done"
+        if ahead:
+            text += f" ({ahead} jobs aage hain)"
+        st.progress(len(done) / len(gates), text=text)
+        render(done, False)
+
+    poll()
+    return False
@@ -0,0 +1,164 @@
+import io
+import math
+from collections import namedtuple
+
+import metrics
+
+# ==========================================
+# SIZE-TARGETED JPEG ENCODER
+# ==========================================
+# Har tab ko file size ki ek window chahiye (jaise 5-12 KB, 400-600 KB).
+# Quality ko ek ek step badal kar dobara encode karne ke bajaye, yahan
+# size(quality) ko log scale par interpolate / bisect kar ke quality
+# dhoondi jati hai. Aam tor par 3-5 encode kaafi hote hain.
+#
+# Window ke dono sire hon toh window mein sab se oonchi quality;
+# sirf min ho toh min se upar sab se chhoti file; sirf max ho toh
+# max ke neeche sab se oonchi quality.
+#
+# Sirf quality se window na mile toh settings badal kar dekha jata hai:
+# file chhoti reh jaye toh 4:4:4 chroma (bari file), bari reh jaye toh
+# progressive + optimize (chhoti file).
+
+EncodeResult = namedtuple(
+    "EncodeResult",
+    ["data", "size", "quality", "subsampling", "progressive", "attempts", "in_range"]
+)
+
+# Pillow subsampling values
+SUBSAMPLING_420 = 2
+SUBSAMPLING_444 = 0
+
+
+def encode_jpeg(image, quality, subsampling=SUBSAMPLING_420, progressive=False, optimize=False):
+    buf = io.BytesIO()
+    image.save(
+        buf,
+        format="JPEG",
+        quality=quality,
+        subsampling=subsampling,
+        progressive=progressive,
+        optimize=optimize
+    )
+    return buf.getvalue()
+
+
+class _Sizer:
+    # Ek settings profile ke liye quality -> encoded bytes (har quality ek hi baar)
+
+    def __init__(self, image, subsampling, progressive, optimize, counter):
+        self.image = image
+        self.subsampling = subsampling
+        self.progressive = progressive
+        self.optimize = optimize
+        self.counter = counter
+        self.cache = {}
+
+    def data(self, quality):
+        if quality not in self.cache:
+            self.counter[0] += 1
+            self.cache[quality] = encode_jpeg(
+                self.image, quality, self.subsampling, self.progressive, self.optimize
+            )
+        return self.cache[quality]
+
+    def size(self, quality):
+        return len(self.data(quality))
+
+    def result(self, quality, in_range):
+        data = self.data(quality)
+        return EncodeResult(
+            data, len(data), quality, self.subsampling, self.progressive, self.counter[0], in_range
+        )
+
+
+def _last_at_most(sizer, lo, hi, target):
+    # Sab se oonchi quality jis ka size <= target (koi na ho toh None)
+    if sizer.size(hi) <= target:
+        return hi
+    if sizer.size(lo) > target:
+        return None
+
+    a, b = lo, hi
+    bisect = False
+    while b - a > 1:
+        if bisect:
+            q = (a + b) // 2
+        else:
+            # log(size) quality ke saath takreeban seedha chalta hai
+            la, lb = math.log(sizer.size(a)), math.log(sizer.size(b))
+            t = (math.log(target) - la) / (lb - la) if lb > la else 0.5
+            q = min(b - 1, max(a + 1, round(a + t * (b - a))))
+
+        width = b - a
+        if sizer.size(q) <= target:
+            a = q
+        else:
+            b = q
+        # Interpolation ne bracket aadha bhi na kiya toh agli baar bisect
+        bisect = (b - a) * 2 > width
+    return a
+
+
+def _search(sizer, lo, hi, min_bytes, max_bytes):
+    # (quality, in_range) is profile ke liye
+    if max_bytes is not None:
+        q = _last_at_most(sizer, lo, hi, max_bytes)
+        if q is None:
+            return lo, False
+        return q, min_bytes is None or sizer.size(q) >= min_bytes
+
+    if min_bytes is not None:
+        below = _last_at_most(sizer, lo, hi, min_bytes - 1)
+        if below is None:
+            return lo, True
+        if below == hi:
+            return hi, False
+        return below + 1, True
+
+    return hi, True
+
+
+def window_distance(size, min_bytes=None, max_bytes=None):
+    # Window se kitne bytes bahar (andar ho toh 0)
+    if min_bytes is not None and size < min_bytes:
+        return min_bytes - size
+    if max_bytes is not None and size > max_bytes:
+        return size - max_bytes
+    return 0
+
+
+def encode_to_range(image, min_bytes=None, max_bytes=None, quality_range=(20, 95), optimize=False):
+    with metrics.span("jpeg.encode_to_range"):
+        result = _encode_to_range(image, min_bytes, max_bytes, quality_range, optimize)
+    metrics.count("jpeg.encodes", result.attempts)
+    if not result.in_range:
+        metrics.count("jpeg.out_of_range")
+    return result
+
+
+def _encode_to_range(image, min_bytes, max_bytes, quality_range, optimize):
+    lo, hi = quality_range
+    counter = [0]
+
+    sizer = _Sizer(image, SUBSAMPLING_420, False, optimize, counter)
+    q, ok = _search(sizer, lo, hi, min_bytes, max_bytes)
+    if ok:
+        return sizer.result(q, True)
+
+    best = sizer.result(q, False)
+    if min_bytes is not None and best.size < min_bytes:
+        # Quality poori kar ke bhi chhoti: chroma full resolution par rakho
+        fallback = _Sizer(image, SUBSAMPLING_444, False, optimize, counter)
+    else:
+        # Sab se kam quality par bhi bari: progressive + optimize
+        fallback = _Sizer(image, SUBSAMPLING_420, True, True, counter)
+
+    q, ok = _search(fallback, lo, hi, min_bytes, max_bytes)
+    result = fallback.result(q, ok)
+    if ok:
+        return result
+
+    # Window na mili: jo zyada qareeb ho wahi do
+    closest = min((best, result), key=lambda r: window_distance(r.size, min_bytes, max_bytes))
+    return closest._replace(attempts=counter[0])
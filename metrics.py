@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# ==========================================
+# STAGE TIMINGS + COUNTERS
+# ==========================================
+# Group upload slow ho toh pata chale waqt kahan gaya: decode, MRZ rotation
+# retries, tesseract, face detection ya JPEG quality search.
+#
+#   with metrics.span("pnr.mrz_read"): ...
+#   metrics.count("pnr.mrz_attempts")
+#
+# Sab process-wide (sab sessions / threads ka total). METRICS_LOG env set ho
+# toh har span ek JSON line ban kar us file mein bhi likha jata hai.
+# Export: to_prometheus() (text format) aur to_jsonl() (snapshot).
+
+METRICS_LOG = os.environ.get("METRICS_LOG")
+PREFIX = "passport_app"
+
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+# span -> [count, total seconds, max seconds]
+_spans = {}
+_counters = {}
+_started = time.time()
+
+
+def _record(name, seconds):
+    with _lock:
+        s = _spans.setdefault(name, [0, 0.0, 0.0])
+        s[0] += 1
+        s[1] += seconds
+        s[2] = max(s[2], seconds)
+    if METRICS_LOG:
+        line = json.dumps({"ts": time.time(), "pid": os.getpid(), "span": name, "seconds": seconds})
+        with _log_lock, open(METRICS_LOG, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+
+def observe(name, seconds):
+    # Waqt pehle se maloom ho (e.g. job queue mein intezar)
+    _record(name, seconds)
+
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def snapshot():
+    with _lock:
+        return {
+            "since": _started,
+            "spans": {k: {"count": c, "seconds": t, "max": m} for k, (c, t, m) in _spans.items()},
+            "counters": dict(_counters),
+        }
+
+
+def reset():
+    global _started
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _started = time.time()
+
+
+def drain():
+    # Process pool worker: apna hissa parent ko bhejo aur khud zero se shuru
+    data = snapshot()
+    reset()
+    return data
+
+
+def merge(data):
+    # Worker ka drain() yahan jama karo
+    with _lock:
+        for k, v in data["spans"].items():
+            s = _spans.setdefault(k, [0, 0.0, 0.0])
+            s[0] += v["count"]
+            s[1] += v["seconds"]
+            s[2] = max(s[2], v["max"])
+        for k, v in data["counters"].items():
+            _counters[k] = _counters.get(k, 0) + v
+
+
+# ==========================================
+# EXPORT
+# ==========================================
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def to_prometheus():
+    data = snapshot()
+    out = [
+        f"# TYPE {PREFIX}_span_seconds_total counter",
+        f"# TYPE {PREFIX}_span_calls_total counter",
+        f"# TYPE {PREFIX}_span_max_seconds gauge",
+    ]
+    for name, s in sorted(data["spans"].items()):
+        label = f'{{span="{_label(name)}"}}'
+        out.append(f"{PREFIX}_span_seconds_total{label} {s['seconds']:.6f}")
+        out.append(f"{PREFIX}_span_calls_total{label} {s['count']}")
+        out.append(f"{PREFIX}_span_max_seconds{label} {s['max']:.6f}")
+    out.append(f"# TYPE {PREFIX}_events_total counter")
+    for name, v in sorted(data["counters"].items()):
+        out.append(f'{PREFIX}_events_total{{name="{_label(name)}"}} {v}')
+    return "\n".join(out) + "\n"
+
+
+def to_jsonl():
+    # Ek line: poora snapshot (log file mein append karne ke laayak)
+    return json.dumps({"ts": time.time(), "pid": os.getpid(), **snapshot()}) + "\n"
+
+
+# ==========================================
+# STREAMLIT DEBUG PANEL
+# ==========================================
+def debug_panel():
+    import streamlit as st
+
+    data = snapshot()
+    with st.sidebar.expander("Debug: stage timings", expanded=True):
+        rows = sorted(data["spans"].items(), key=lambda kv: -kv[1]["seconds"])
+        if rows:
+            st.dataframe({
+                "Stage": [k for k, _ in rows],
+                "Calls": [s["count"] for _, s in rows],
+                "Total s": [round(s["seconds"], 3) for _, s in rows],
+                "Mean ms": [round(1000 * s["seconds"] / s["count"], 1) for _, s in rows],
+                "Max ms": [round(1000 * s["max"], 1) for _, s in rows],
+            }, hide_index=True)
+        if data["counters"]:
+            st.dataframe({
+                "Counter": list(data["counters"]),
+                "Value": list(data["counters"].values()),
+            }, hide_index=True)
+        if not rows and not data["counters"]:
+            st.caption("Abhi kuch record nahi hua")
+
+        st.download_button("Prometheus text", to_prometheus(), "metrics.prom", "text/plain")
+        st.download_button("JSON line", to_jsonl(), "metrics.jsonl", "application/json")
+        if st.button("Reset metrics"):
+            reset()
+            st.rerun()
@@ -0,0 +1,154 @@
+import os
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+import metrics
+from instance_pool import PoolRegistry
+
+# =====================================================
+# OCR ENGINE (PERSISTENT TESSERACT)
+# =====================================================
+# pytesseract har call par naya tesseract process chalata hai, temp image
+# likhta hai aur traineddata dobara load karta hai (har call par kai sau ms).
+# tesserocr install ho toh TessBaseAPI ek dafa bana kar pool mein rakha jata
+# hai aur baar baar use hota hai. Na ho (ya load fail ho) toh pytesseract
+# wala subprocess rasta fallback hai.
+#
+# Backend OCR_BACKEND env se: "tesserocr", "pytesseract" ya khaali (auto).
+
+LANG = "eng"
+
+# image_to_data / GetTSVText ke columns
+TSV_COLUMNS = [
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height", "conf", "text"
+]
+
+
+def parse_tsv(tsv):
+    # pytesseract Output.DICT jaisa dict (API wale TSV mein header nahi hota)
+    data = {c: [] for c in TSV_COLUMNS}
+    for line in tsv.splitlines():
+        parts = line.split("\t")
+        if len(parts) < len(TSV_COLUMNS) - 1 or parts[0] == "level":
+            continue
+        parts += [""] * (len(TSV_COLUMNS) - len(parts))
+        for c, v in zip(TSV_COLUMNS, parts):
+            if c == "text":
+                data[c].append(v)
+            elif c == "conf":
+                data[c].append(float(v))
+            else:
+                data[c].append(int(v))
+    return data
+
+
+class EngineUnavailable(RuntimeError):
+    pass
+
+
+def _config(psm, whitelist):
+    config = f"--psm {psm}"
+    if whitelist:
+        config += f" -c tessedit_char_whitelist={whitelist}"
+    return config
+
+
+class SubprocessEngine:
+    # Purana rasta: har call ek tesseract process
+
+    def image_to_string(self, img, psm=3, whitelist=None):
+        return pytesseract.image_to_string(img, lang=LANG, config=_config(psm, whitelist))
+
+    def image_to_data(self, img, psm=3, whitelist=None):
+        return pytesseract.image_to_data(
+            img, lang=LANG, config=_config(psm, whitelist), output_type=pytesseract.Output.DICT
+        )
+
+
+class TesserocrEngine:
+    # Ek zinda TessBaseAPI; ek waqt mein ek hi thread use kare (pool dekhta hai)
+
+    def __init__(self):
+        import tesserocr
+        try:
+            self.api = tesserocr.PyTessBaseAPI(lang=LANG)
+        except RuntimeError as e:
+            raise EngineUnavailable(f"tesserocr load nahi hua: {e}")
+
+    def _recognize(self, img, psm, whitelist):
+        self.api.SetPageSegMode(psm)
+        # Khaali whitelist = sab characters (pichhli call ka whitelist hata do)
+        self.api.SetVariable("tessedit_char_whitelist", whitelist or "")
+        if isinstance(img, np.ndarray):
+            img = Image.fromarray(np.ascontiguousarray(img))
+        self.api.SetImage(img)
+        self.api.Recognize()
+
+    def image_to_string(self, img, psm=3, whitelist=None):
+        self._recognize(img, psm, whitelist)
+        return self.api.GetUTF8Text()
+
+    def image_to_data(self, img, psm=3, whitelist=None):
+        self._recognize(img, psm, whitelist)
+        return parse_tsv(self.api.GetTSVText(0))
+
+
+BACKENDS = {
+    "tesserocr": TesserocrEngine,
+    "pytesseract": SubprocessEngine,
+}
+
+
+_pools = PoolRegistry(BACKENDS, "OCR backend")
+# Jo backend ek dafa fail ho gaya, is process mein dobara try nahi hota
+_unavailable = set()
+
+
+def _has_tesserocr():
+    try:
+        import tesserocr  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def default_backend():
+    backend = os.environ.get("OCR_BACKEND", "").lower()
+    if not backend:
+        backend = "tesserocr" if _has_tesserocr() else "pytesseract"
+    return "pytesseract" if backend in _unavailable else backend
+
+
+def get_pool(backend=None):
+    return _pools.get(backend or default_backend())
+
+
+def _call(method, img, psm, whitelist):
+    backend = default_backend()
+    try:
+        with get_pool(backend).acquire() as engine:
+            return getattr(engine, method)(img, psm, whitelist)
+    except (EngineUnavailable, ImportError):
+        if backend == "pytesseract":
+            raise
+        _unavailable.add(backend)
+        metrics.count("ocr.fallback")
+        return _call(method, img, psm, whitelist)
+
+
+# =====================================================
+# PUBLIC API
+# =====================================================
+def image_to_string(img, psm=3, whitelist=None):
+    # img: numpy array ya PIL image
+    with metrics.span("ocr.image_to_string"):
+        return _call("image_to_string", img, psm, whitelist)
+
+
+def image_to_data(img, psm=3, whitelist=None):
+    # pytesseract.Output.DICT jaisa dict (text, left, width, line_num, ...)
+    with metrics.span("ocr.image_to_data"):
+        return _call("image_to_data", img, psm, whitelist)
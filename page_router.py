@@ -0,0 +1,27 @@
+import importlib
+import time
+
+# ==========================================
+# LAZY PAGE ROUTER
+# ==========================================
+# Sirf selected page ka module import hota hai, baaqi sab untouched.
+
+PAGES = {
+    "Passport Auto PNR": "Passport_Auto_PNR",
+    "Passport Photo Maker": "Passport_Photo_Maker",
+    "Passport Size Maker": "Passport_Size_Maker",
+    "Hajj Form Extractor": "Hajj_Form_Extractor",
+    "eHajj Passport Size": "ehajj_passport_size",
+    "eHajj Photo Size": "ehajj_photo_size",
+}
+
+# module name -> pehli dafa import mein laga waqt (seconds)
+IMPORT_TIMES = {}
+
+
+def load_page(label):
+    name = PAGES[label]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES.setdefault(name, time.perf_counter() - start)
+    return module
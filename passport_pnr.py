@@ -0,0 +1,544 @@
+from passporteye.mrz.image import MRZPipeline
+import datetime
+import pytesseract
+import os
+import cv2
+import numpy as np
+import re
+import sys
+import csv
+import json
+import time
+import argparse
+import zipfile
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from result_cache import ResultCache, content_key, MISS
+import ocr_engine
+import metrics
+from image_core import decode_gray
+
+# ================= TESSERACT =================
+if os.name == "nt":
+    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+else:
+    pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"
+
+# ================= RESULT CACHE =================
+# Sab sessions ke liye ek cache; PNR_CACHE_DIR set ho toh disk par bhi
+RESULT_CACHE = ResultCache(max_items=1024, disk_dir=os.environ.get("PNR_CACHE_DIR"))
+
+# ================= IN-MEMORY MRZ =================
+# np.rot90 k values: 0 no rotation, -1 90 clockwise, 2 180, 1 90 counter-clockwise
+OPPOSITE = {0: 2, 2: 0, -1: 1, 1: -1}
+
+# TD3 passport page 125 x 88 mm; MRZ poori chaudai leta hai
+PAGE_ASPECT = 88 / 125
+# Data page ka left hissa photo hai, fields us ke right mein hain
+PHOTO_FRACTION = 0.25
+CNIC_PATTERN = r"\d{5}-\d{7}-\d"
+
+# Orientation guess isi size ki copy par hota hai
+ORIENT_SIZE = 512
+# Ek axis ka score doosre se itna guna ho toh perpendicular rotations skip
+ORIENT_CONFIDENT = 2.0
+
+def decode_upload(data):
+    # Upload bytes ko seedha grayscale array mein decode karo
+    return decode_gray(data)
+
+def read_mrz_array(img):
+    # passporteye pipeline ka loader skip karo, decoded image seedha do
+    metrics.count("pnr.mrz_attempts")
+    try:
+        p = MRZPipeline(None)
+        p["img"] = img
+        mrz = p.result
+        if mrz and mrz.to_dict():
+            # MRZ box ko full size image ke (top, bottom, left, right) mein rakho
+            poly = p["boxes"][p["box_idx"]].as_poly() / p["scale_factor"]
+            mrz.aux["bbox"] = (poly[:, 0].min(), poly[:, 0].max(), poly[:, 1].min(), poly[:, 1].max())
+            return mrz
+    except (OSError, pytesseract.TesseractError):
+        # Tesseract missing / crash "MRZ nahi mila" nahi: error ban kar upar jaye
+        raise
+    except Exception: pass
+    return None
+
+def upright_page(gray, mrz):
+    # MRZ page ke neeche hota hai; upar mila toh passporteye ne ROI ulta padha tha
+    h, w = gray.shape[:2]
+    top, bottom, left, right = mrz.aux["bbox"]
+    if (top + bottom) / 2 >= h / 2:
+        return gray
+    mrz.aux["bbox"] = (h - bottom, h - top, w - right, w - left)
+    return np.rot90(gray, 2)
+
+# ================= ORIENTATION GUESS =================
+def _profile_score(profile):
+    # Text lines ke beech gaps profile mein tez utaar chadhaav banate hain
+    trend = cv2.blur(profile.reshape(-1, 1), (1, 31)).ravel()
+    return np.abs(profile - trend).mean() / (profile.mean() + 1e-6)
+
+def estimate_orientation(gray):
+    # Chhoti copy par text lines ki direction aur MRZ band ki position dekho
+    h, w = gray.shape[:2]
+    scale = min(1.0, ORIENT_SIZE / max(h, w))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))
+    ink = cv2.morphologyEx(small, cv2.MORPH_BLACKHAT, kernel).astype(np.float32)
+
+    rows = ink.mean(axis=1)
+    cols = ink.mean(axis=0)
+    h_score = _profile_score(rows)
+    v_score = _profile_score(cols)
+
+    # MRZ sab se ghana band hai aur page ke neeche hota hai
+    upright = 0 if rows.argmax() >= len(rows) / 2 else 2
+    sideways = 1 if cols.argmax() < len(cols) / 2 else -1
+
+    if h_score >= v_score:
+        first, second = upright, sideways
+    else:
+        first, second = sideways, upright
+    confident = bool(max(h_score, v_score) > ORIENT_CONFIDENT * min(h_score, v_score))
+
+    order = [first, OPPOSITE[first], second, OPPOSITE[second]]
+    return order, confident
+
+# ---------- DATE FIX ----------
+def mrz_date_fix(d):
+    try:
+        if not d or len(str(d)) < 6: return None
+        d = str(d)
+        y = int(d[:2])
+        m = int(d[2:4])
+        da = int(d[4:6])
+        if y > datetime.datetime.now().year % 100: y += 1900
+        else: y += 2000
+        return datetime.datetime(y, m, da)
+    except: return None
+
+def safe_date(d):
+    dt = mrz_date_fix(d)
+    return "" if dt is None else dt.strftime("%d%b%y").upper()
+
+def calculate_age(d):
+    birth = mrz_date_fix(d)
+    if birth is None: return 30, ""
+    today = datetime.datetime.today()
+    age = today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
+    return age, birth.strftime("%d%b%y").upper()
+
+# ---------- TITLE ----------
+def passenger_title(age, gender):
+    if age >= 12: return "MR" if gender == "M" else "MRS"
+    elif age >= 2: return "CHD"
+    else: return "INF"
+
+# ---------- NAME CLEANER ----------
+def clean_word(w):
+    if len(w) <= 1: return False
+    if len(set(w)) == 1: return False
+    if w.count("K") > len(w) * 0.6: return False
+    return True
+
+def split_joined_name(name):
+    patterns = ["ABDUR", "ABDUL", "REHMAN", "RAHMAN", "SYED", "AHMED", "MUHAMMAD", "MOHAMMAD", "ALI", "HUSSAIN", "HASSAN", "KHAN"]
+    for p in patterns:
+        name = name.replace(p, " " + p)
+    return " ".join(name.split())
+
+def parse_mrz_names(surname, names):
+    surname = surname.replace("<", "").strip().upper()
+    names = names.replace("<", " ")
+    names = " ".join(names.split()).upper()
+    words = []
+    for w in names.split():
+        if clean_word(w):
+            words.append(split_joined_name(w))
+    return surname, " ".join(words)
+
+# ---------- OCR EXTRA ----------
+def fields_region(gray, bbox):
+    # MRZ ke upar, photo ke right wala hissa (father name, CNIC yahin hote hain)
+    if bbox is None: return gray
+    top, bottom, left, right = bbox
+    width = right - left
+    y0 = max(0, int(bottom - width * PAGE_ASPECT))
+    x0 = max(0, int(left + width * PHOTO_FRACTION))
+    region = gray[y0:int(top), x0:int(right)]
+    return region if region.size else gray
+
+def ocr_lines(gray):
+    # Word boxes ko reading order mein lines mein jodo
+    data = ocr_engine.image_to_data(np.ascontiguousarray(gray))
+    lines = {}
+    for i, word in enumerate(data["text"]):
+        word = word.strip().upper()
+        if not word: continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append((data["left"][i], data["width"][i], data["height"][i], word))
+    return list(lines.values())
+
+def column_text(words, left):
+    # Label ke column se shuru karo, bade gap (agla column) par ruk jao
+    out, end = [], None
+    for x, w, h, word in words:
+        if x + w <= left: continue
+        if end is not None and x - end > 3 * h: break
+        out.append(word)
+        end = x + w
+    return " ".join(out)
+
+def extract_extra_fields(gray, bbox=None):
+    if gray is None: return "", ""
+    lines = ocr_lines(fields_region(gray, bbox))
+    father, cnic = "", ""
+    for i, words in enumerate(lines):
+        line = " ".join(w[3] for w in words)
+        if "FATHER" in line or "HUSBAND" in line:
+            if i + 1 < len(lines):
+                label = next(w for w in words if "FATHER" in w[3] or "HUSBAND" in w[3])
+                father = column_text(lines[i+1], label[0])
+        m = re.search(CNIC_PATTERN, line)
+        if m: cnic = m.group()
+    return father, cnic
+
+# ---------- NEW SMART MRZ READER ----------
+def read_mrz_smart(gray):
+    if gray is None: return None, None
+
+    # passporteye ko float (0-1) image chahiye, ek hi baar convert karo
+    img = gray.astype(np.float32)
+    img /= 255.0
+
+    # 1. Pehle andaza lagao page kis taraf ghooma hai, wahi angle pehle try karo.
+    # Andaza pakka ho toh perpendicular angles chhod do.
+    # (np.rot90 sirf view banata hai, koi copy / disk write nahi)
+    order, confident = estimate_orientation(gray)
+    if confident: order = order[:2]
+    for k in order:
+        mrz = read_mrz_array(np.rot90(img, k))
+        if mrz: return mrz, upright_page(np.rot90(gray, k), mrz)
+
+    # 2. Double Page Scan fix (Sirf bottom half check karo)
+    h, w = img.shape[:2]
+    if h > w:
+        mrz = read_mrz_array(img[h // 2:, :])
+        if mrz: return mrz, upright_page(gray[h // 2:, :], mrz)
+
+    return None, None
+
+# ================= PER-PASSPORT WORK =================
+def process_passport(data):
+    # Ek passport ka poora kaam (process pool worker mein chalta hai)
+    with metrics.span("pnr.decode"):
+        gray = decode_upload(data)
+    with metrics.span("pnr.mrz_read"):
+        mrz, page = read_mrz_smart(gray)
+    if not mrz:
+        metrics.count("pnr.mrz_failed")
+        return None
+
+    d = mrz.to_dict()
+    surname, names = parse_mrz_names(d.get("surname", ""), d.get("names", ""))
+    gender = d.get("sex", "M")
+    country = d.get("country", "PAK")
+    age, dob = calculate_age(d.get("date_of_birth"))
+    exp = safe_date(d.get("expiration_date"))
+    with metrics.span("pnr.extra_fields"):
+        father, cnic = extract_extra_fields(page, mrz.aux.get("bbox"))
+    title = passenger_title(age, gender)
+
+    return {
+        "surname": surname, "names": names, "title": title, "passport": d.get("number", ""),
+        "dob": dob, "exp": exp, "gender": gender, "country": country,
+        "father": father, "cnic": cnic
+    }
+
+# ================= BATCH ENGINE =================
+def init_worker():
+    # Har worker ek core le, tesseract apne threads na phailaye
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    # Fork mein parent ki metrics copy ho jati hain; worker zero se gine
+    metrics.reset()
+
+def timed_passport(data):
+    # Job entry point (pool / job queue / API): (record ya None, seconds, error).
+    # Exception error string ban jata hai, raise nahi hota.
+    start = time.perf_counter()
+    try:
+        p, error = process_passport(data), ""
+    except Exception as e:
+        p, error = None, str(e)
+    return p, time.perf_counter() - start, error
+
+def _pooled_passport(data):
+    # Worker ki metrics result ke saath parent ko wapas
+    return timed_passport(data), metrics.drain()
+
+def pending_work(blobs, cache=RESULT_CACHE):
+    # Cache mein nahi wali unique files: {content key: bytes}
+    todo = {}
+    for b in blobs:
+        k = content_key(b)
+        if k not in todo and (not cache or cache.get(k) is MISS):
+            todo[k] = b
+    return todo
+
+def cache_on_done(futures, cache=RESULT_CACHE):
+    # Job queue ke futures ({content key: Future of timed_passport}): asal
+    # record job khatam hote hi cache mein. iter_batch ke upload order ka
+    # intezar nahi, aur upload badal jaye tab bhi tayyar result zaya na ho.
+    if not cache: return
+    for k, future in futures.items():
+        future.add_done_callback(lambda f, k=k: _cache_done(cache, k, f))
+
+def _cache_done(cache, k, future):
+    if future.cancelled() or future.exception(): return
+    p, _, error = future.result()
+    if p and not error: cache.put(k, p)
+
+def job_failed(future):
+    # Crash / cancel / tesseract error: agle rerun par dobara try ke laayak
+    # (MRZ nahi mila failure nahi, wohi jawab dobara aayega)
+    if not future.done(): return False
+    if future.cancelled() or future.exception(): return True
+    return bool(future.result()[2])
+
+def iter_batch(blobs, workers=None, cache=RESULT_CACHE, futures=None):
+    # Har file ka result upload order mein, tayyar hote hi yield karo.
+    # UI aur non-UI dono isi generator ko use karte hain.
+    # futures: {content key: Future of timed_passport} job queue se; diye
+    # hon toh apna pool nahi banta (un ke results cache_on_done cache karta hai).
+    keys = [content_key(b) for b in blobs]
+    results = [cache.get(k) if cache else MISS for k in keys]
+    metrics.count("pnr.cache_hits", sum(r is not MISS for r in results))
+
+    # Ek jaisi files sirf ek baar process hon
+    todo = {}
+    for k, b, r in zip(keys, blobs, results):
+        if r is MISS: todo.setdefault(k, b)
+
+    queued = futures or {}
+    workers = min(len(todo.keys() - queued.keys()), workers or os.cpu_count() or 1)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker) if workers > 1 else None
+    try:
+        pooled = {k: pool.submit(_pooled_passport, b) for k, b in todo.items() if k not in queued} if pool else {}
+        done = {}
+
+        for i, (k, p) in enumerate(zip(keys, results)):
+            seconds, error, cached = 0.0, "", p is not MISS or k in done
+            if p is MISS and k in done:
+                p = done[k]
+                metrics.count("pnr.duplicates")
+            elif p is MISS:
+                if k in queued:
+                    try:
+                        p, seconds, error = queued[k].result()
+                    except (Exception, CancelledError) as e:
+                        # Worker crash / cancel: sirf is file ka error
+                        p, error = None, str(e) or type(e).__name__
+                elif pool:
+                    (p, seconds, error), worker_metrics = pooled[k].result()
+                    metrics.merge(worker_metrics)
+                else:
+                    p, seconds, error = timed_passport(todo[k])
+                metrics.count("pnr.processed")
+                done[k] = p
+                # Sirf asal record cache: None (MRZ nahi mila) agli dafa dobara try ho
+                if cache and p and not error and k not in queued: cache.put(k, p)
+
+            # Cache ki copy do taake caller usay badal na sake
+            yield {"index": i, "record": dict(p) if p else None,
+                   "seconds": seconds, "cached": cached, "error": error}
+    finally:
+        if pool: pool.shutdown(cancel_futures=True)
+
+def process_batch(blobs, workers=None, cache=RESULT_CACHE):
+    return [ev["record"] for ev in iter_batch(blobs, workers, cache)]
+
+# ================= PNR LINES =================
+def build_pnr_lines(passengers):
+    adults, children, infants = [], [], []
+    nm1_lines, docs_lines = [], []
+
+    for pax, p in enumerate(passengers, 1):
+        if p["title"] == "INF": infants.append(p)
+        elif p["title"] in ["MSTR", "MISS", "CHD"]: children.append(p)
+        else: adults.append(p)
+
+        docs_lines.append(f"SRDOCS SV HK1-P-{p['country']}-{p['passport']}-{p['country']}-{p['dob']}-{p['gender']}-{p['exp']}-{p['surname']}-{p['names'].replace(' ','-')}-H/P{pax}")
+
+    inf_index = 0
+    for adult in adults:
+        nm1 = f"NM1{adult['surname']}/{adult['names']} {adult['title']}"
+        if inf_index < len(infants):
+            inf = infants[inf_index]
+            nm1 += f" (INF/{inf['surname']} {inf['names']}/{inf['dob']})"
+            inf_index += 1
+        nm1_lines.append(nm1)
+
+    for chd in children:
+        nm1_lines.append(f"NM1{chd['surname']}/{chd['names']} {chd['title']} (CHD/{chd['dob']})")
+
+    return nm1_lines, docs_lines
+
+# ================= COMMAND LINE =================
+# python passport_pnr.py scans/ group.zip -o out --workers 8
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+CSV_FIELDS = ["file", "surname", "names", "title", "passport", "dob", "exp", "gender", "country", "father", "cnic"]
+
+def iter_scans(path):
+    # Folder ya zip se (naam, bytes) ek ek kar ke do, sab memory mein nahi
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for name in sorted(zf.namelist()):
+                if name.lower().endswith(IMAGE_EXTS):
+                    yield name, zf.read(name)
+        return
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in sorted(names):
+            if name.lower().endswith(IMAGE_EXTS):
+                full = os.path.join(root, name)
+                with open(full, "rb") as fp:
+                    yield os.path.relpath(full, path), fp.read()
+
+# Har worker ke liye itne scans pool mein (baaqi abhi disk / zip mein hi)
+SCANS_PER_WORKER = 4
+
+def iter_scan_results(scans, workers=None, cache=RESULT_CACHE):
+    # scans: (naam, bytes) ka iterable. Poore run ke liye ek hi pool; window
+    # bhari ho toh agla scan tab parha jaye jab pehla nikle. Har scan ka
+    # event {"name", "record", "seconds", "cached", "error"} input order mein.
+    workers = workers or os.cpu_count() or 1
+    pools = {"main": None, "alone": None}
+    pending = deque()
+    # Window mein ek jaisi files: content key -> [future ya bytes, result, refs, bytes, pool]
+    inflight = {}
+
+    def submit(data):
+        if pools["main"] is None:
+            pools["main"] = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+        return pools["main"].submit(_pooled_passport, data), pools["main"]
+
+    def retry_alone(entry, e):
+        # Worker mar gaya (OOM / native crash): poore pool ke jobs toot jate
+        # hain. Pool naya banao aur yeh scan akele worker mein dobara; wahan
+        # bhi mare toh sirf isi file ka error, baaqi run chalta rahe.
+        metrics.count("pnr.worker_failed")
+        if isinstance(e, BrokenProcessPool) and pools["main"] is entry[4]:
+            pools["main"].shutdown(wait=False, cancel_futures=True)
+            pools["main"] = None
+        if pools["alone"] is None:
+            pools["alone"] = ProcessPoolExecutor(max_workers=1, initializer=init_worker)
+        try:
+            return pools["alone"].submit(_pooled_passport, entry[3]).result()
+        except (Exception, CancelledError) as e:
+            pools["alone"].shutdown(wait=False, cancel_futures=True)
+            pools["alone"] = None
+            return (None, 0.0, f"Worker crash: {str(e) or type(e).__name__}"), None
+
+    def finish(name, k, p):
+        seconds, error, cached = 0.0, "", p is not MISS
+        if p is MISS:
+            entry = inflight[k]
+            if entry[1] is None:
+                if workers > 1:
+                    try:
+                        entry[1], worker_metrics = entry[0].result()
+                    except (Exception, CancelledError) as e:
+                        entry[1], worker_metrics = retry_alone(entry, e)
+                    if worker_metrics: metrics.merge(worker_metrics)
+                else:
+                    entry[1] = timed_passport(entry[3])
+                p, seconds, error = entry[1]
+                metrics.count("pnr.processed")
+                if cache and p and not error: cache.put(k, p)
+            else:
+                p, error, cached = entry[1][0], entry[1][2], True
+                metrics.count("pnr.duplicates")
+            entry[2] -= 1
+            if not entry[2]: del inflight[k]
+        return {"name": name, "record": dict(p) if p else None,
+                "seconds": seconds, "cached": cached, "error": error}
+
+    try:
+        for name, data in scans:
+            k = content_key(data)
+            p = cache.get(k) if cache else MISS
+            if p is not MISS:
+                metrics.count("pnr.cache_hits")
+            elif k in inflight:
+                inflight[k][2] += 1
+            else:
+                job, pool = submit(data) if workers > 1 else (None, None)
+                inflight[k] = [job, None, 1, data, pool]
+            pending.append((name, k, p))
+            while len(pending) >= workers * SCANS_PER_WORKER:
+                yield finish(*pending.popleft())
+        while pending:
+            yield finish(*pending.popleft())
+    finally:
+        for pool in pools.values():
+            if pool: pool.shutdown(cancel_futures=True)
+
+def convert(paths, workers=None, log=None):
+    # Scans stream hote hain taake hazaron ek saath memory mein na hon
+    log = log or (lambda msg: print(msg, file=sys.stderr))
+    passengers, seen = [], set()
+    scans = (scan for path in paths for scan in iter_scans(path))
+
+    for ev in iter_scan_results(scans, workers):
+        name, p = ev["name"], ev["record"]
+        if ev["error"]:
+            log(f"ERROR {name}: {ev['error']}")
+            continue
+        if not p:
+            log(f"MRZ not detected: {name}")
+            continue
+        if p["passport"] in seen:
+            log(f"Duplicate skipped: {p['passport']} ({name})")
+            continue
+        seen.add(p["passport"])
+        p["file"] = name
+        passengers.append(p)
+
+    return passengers
+
+def write_outputs(passengers, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    nm1_lines, docs_lines = build_pnr_lines(passengers)
+
+    with open(os.path.join(out_dir, "nm1.txt"), "w", encoding="utf-8") as fp:
+        fp.write("\n".join(nm1_lines) + "\n")
+    with open(os.path.join(out_dir, "srdocs.txt"), "w", encoding="utf-8") as fp:
+        fp.write("\n".join(docs_lines) + "\n")
+    with open(os.path.join(out_dir, "passengers.json"), "w", encoding="utf-8") as fp:
+        json.dump(passengers, fp, indent=2)
+    with open(os.path.join(out_dir, "passengers.csv"), "w", encoding="utf-8", newline="") as fp:
+        writer = csv.DictWriter(fp, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(passengers)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert passport scans to NM1 / SRDOCS entries.")
+    parser.add_argument("inputs", nargs="+", help="folder or .zip of passport scans (jpg / png)")
+    parser.add_argument("-o", "--out", default="pnr_output", help="output folder (default: pnr_output)")
+    parser.add_argument("--workers", type=int, default=None, help="parallel worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+    for path in args.inputs:
+        if not (os.path.isdir(path) or zipfile.is_zipfile(path)):
+            parser.error(f"{path}: folder ya .zip nahi hai")
+
+    start = time.perf_counter()
+    passengers = convert(args.inputs, args.workers)
+    write_outputs(passengers, args.out)
+    print(f"{len(passengers)} passengers written to {args.out} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# ==========================================
+# CONTENT-HASH RESULT CACHE
+# ==========================================
+# Same file dobara upload ho toh OCR dobara nahi chalta.
+# Memory mein LRU, aur chahein toh disk par bhi (size limit ke saath).
+
+MISS = object()
+# Limit cross hone par itne hisse tak hatao, taake agli put par dobara scan na ho
+DISK_LOW_WATER = 0.9
+
+
+def content_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+
+    def __init__(self, max_items=512, disk_dir=None, max_disk_mb=64):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Disk files ka kul size; pehli put par ek scan, phir har put par jama
+        self._disk_bytes = None
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # ---------- MEMORY TIER ----------
+    def _remember(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is MISS:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        self._disk_put(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    # ---------- DISK TIER ----------
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + ".json")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return MISS
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fp:
+                value = json.load(fp)
+            # LRU ke liye last-use time update karo
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return MISS
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            old = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp, "w", encoding="utf-8") as fp:
+                json.dump(value, fp)
+            os.replace(tmp, path)
+            new = os.path.getsize(path)
+        except OSError:
+            if os.path.exists(tmp): os.remove(tmp)
+            return
+
+        # Poori directory sirf pehli dafa ya limit cross hone par scan hoti hai
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += new - old
+            scan = self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+        if scan:
+            self._disk_evict()
+
+    def _disk_evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+
+        # Sab se purani (least recently used) files pehle hatao
+        if total > self.max_disk_bytes:
+            entries.sort()
+            for _, size, name in entries:
+                if total <= self.max_disk_bytes * DISK_LOW_WATER:
+                    break
+                try:
+                    os.remove(os.path.join(self.disk_dir, name))
+                    total -= size
+                except OSError:
+                    pass
+
+        # Doosre process bhi likhte hon toh yahan sahi total wapas
+        with self._lock:
+            self._disk_bytes = total
@@ -0,0 +1,48 @@
+import functools
+from importlib import metadata
+
+# ==========================================
+# STARTUP CHECK (NO RUNTIME PIP INSTALL)
+# ==========================================
+# OpenCV build ek hi baar check hota hai (process ke liye cached).
+# Packages sirf build time par install hon, request path mein kabhi nahi.
+
+OPENCV_DISTS = (
+    "opencv-python-headless",
+    "opencv-python",
+    "opencv-contrib-python",
+    "opencv-contrib-python-headless",
+)
+
+
+def installed_opencv():
+    found = []
+    for name in OPENCV_DISTS:
+        try:
+            found.append(f"{name}=={metadata.version(name)}")
+        except metadata.PackageNotFoundError:
+            pass
+    return found
+
+
+@functools.lru_cache(maxsize=None)
+def opencv_problem():
+    try:
+        import cv2
+        cv2.imdecode
+    except (ImportError, AttributeError) as e:
+        builds = ", ".join(installed_opencv()) or "none"
+        return (
+            f"OpenCV could not be loaded ({e}). Installed builds: {builds}. "
+            "Install only opencv-python-headless when building the image, e.g. "
+            "`pip uninstall -y opencv-python && pip install opencv-python-headless`."
+        )
+    return ""
+
+
+# Build time par: python startup_check.py (problem ho toh non-zero exit)
+if __name__ == "__main__":
+    import sys
+    problem = opencv_problem()
+    print(problem or "OpenCV OK: " + ", ".join(installed_opencv()))
+    sys.exit(1 if problem else 0)